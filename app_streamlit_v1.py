@@ -1,6 +1,6 @@
-import sqlite3
 import streamlit as st
 import os
+from db.sqlite_connection import query
 
 DB_FILE = "master_questions.db"  # Change to your master DB file
 USER_ID = 1  # For now static, later can be login-based
@@ -8,10 +8,7 @@ USER_ID = 1  # For now static, later can be login-based
 
 # ===== DB HELPERS =====
 def get_papers_with_progress():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    return query("""
         SELECT 
             p.paper_id,
             p.title,
@@ -25,28 +22,20 @@ def get_papers_with_progress():
         LEFT JOIN user_progress up
         ON p.paper_id = up.paper_id AND up.user_id = ?
         ORDER BY p.type, p.paper_id
-    """, (USER_ID,))
-
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    """, (USER_ID,), db_file=DB_FILE, label="v1.papers_with_progress")
 
 
 def all_mocks_completed():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
+    completed_mocks = query("""
         SELECT COUNT(*) 
         FROM papers p
         LEFT JOIN user_progress up
         ON p.paper_id = up.paper_id AND up.user_id = ?
         WHERE p.type = 'mock' AND IFNULL(up.completed, 0) = 1
-    """, (USER_ID,))
-    completed_mocks = cursor.fetchone()[0]
+    """, (USER_ID,), db_file=DB_FILE, one=True, label="v1.completed_mocks")[0]
 
-    cursor.execute("SELECT COUNT(*) FROM papers WHERE type = 'mock'")
-    total_mocks = cursor.fetchone()[0]
-    conn.close()
+    total_mocks = query("SELECT COUNT(*) FROM papers WHERE type = 'mock'",
+                        db_file=DB_FILE, one=True, label="v1.total_mocks")[0]
 
     return completed_mocks == total_mocks and total_mocks > 0
 
@@ -0,0 +1,253 @@
+# attempts.py
+import time
+import uuid
+import threading
+import traceback
+from array import array
+
+from db import journal
+from db.snapshots import load_paper
+from db.writer import write
+from db.progress import record_submission
+from db.history import record_attempt, encode_sheet
+from db.stats import record_stats
+from deadlines import scheduler
+from shuffle import layout, pinned_questions
+
+OPTIONS = "ABCD"
+UNANSWERED = 0  # selections byte for "no answer"; otherwise ord(letter)
+RETRY_DELAY = 15      # first retry of a failed auto-submit (s), doubled per failure
+RETRY_MAX_DELAY = 600
+
+# Attempts live in this process until submitted, so a reconnecting session finds the same object
+_live = {}  # attempt_id -> Attempt
+_live_lock = threading.Lock()
+_recovered = set()  # db files whose journal was replayed by this process
+
+
+class Attempt:
+    """Server-side state of one timed attempt.
+
+    Question data is never copied: `paper` is the shared, immutable Paper
+    from load_paper. Per-question state is positional (index into
+    paper.questions): one byte per question for the selected option, one
+    bit per question for "marked" and two bytes of seconds spent, so an
+    attempt costs a few hundred bytes plus n * 3.125 bytes whatever the
+    length of the questions.
+
+    Question order and option order are derived from the attempt id (see
+    shuffle.layout): `order` maps displayed positions to question indexes and
+    current_q is a displayed position; selections are canonical letters.
+    """
+
+    __slots__ = ("id", "user_id", "paper", "selections", "marks", "seconds", "current_q", "shown_at",
+                 "deadline", "submitted", "score", "db_file", "lock", "seed", "order", "perms")
+
+    def __init__(self, attempt_id, user_id, paper, deadline, db_file):
+        n = len(paper.questions)
+        self.id = attempt_id
+        self.user_id = user_id
+        self.paper = paper
+        self.selections = bytearray(n)           # ord("A".."D") or UNANSWERED
+        self.marks = bytearray((n + 7) // 8)     # bit i = question i marked
+        self.seconds = array("H", bytes(2 * n))  # time on question i, capped at 65535
+        self.current_q = 0
+        self.shown_at = time.time()              # when current_q was put on screen
+        self.deadline = deadline
+        self.submitted = False
+        self.score = None
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.seed = attempt_seed(attempt_id)
+        self.order, self.perms = layout(self.seed, paper)   # shared, derived: never stored
+
+    @property
+    def paper_id(self):
+        return self.paper.paper_id
+
+    @property
+    def questions(self):
+        return self.paper.questions
+
+    def selected(self, i):
+        code = self.selections[i]
+        return chr(code) if code else None
+
+    def is_marked(self, i):
+        return bool(self.marks[i >> 3] & (1 << (i & 7)))
+
+    def answered_count(self):
+        return len(self.selections) - self.selections.count(UNANSWERED)
+
+    def marked_count(self):
+        return int.from_bytes(self.marks, "little").bit_count()
+
+    def marked_indexes(self):
+        bits = int.from_bytes(self.marks, "little")
+        return [i for i in range(len(self.selections)) if bits >> i & 1]
+
+    def answers(self):
+        """{question_id: letter} for the answered questions"""
+        questions = self.paper.questions
+        return {questions[i][0]: chr(code) for i, code in enumerate(self.selections) if code}
+
+
+def attempt_seed(attempt_id):
+    """Shuffle seed of an attempt: the first 60 bits of its hex id (fits a SQLite INTEGER)"""
+    return int(attempt_id[:15], 16)
+
+
+def _auto_submit(attempt, delay=RETRY_DELAY):
+    # Scheduler callback: a timed-out attempt is saved as not completed
+    try:
+        finalize_attempt(attempt, completed=False)
+    except Exception:
+        traceback.print_exc()
+        # Score stays None and the journal stays open (recover_open_attempts picks it up after a
+        # restart); meanwhile keep retrying with backoff
+        scheduler.schedule(attempt.id, time.time() + delay,
+                           lambda: _auto_submit(attempt, min(delay * 2, RETRY_MAX_DELAY)))
+
+
+def _register(attempt):
+    with _live_lock:
+        _live[attempt.id] = attempt
+    scheduler.schedule(attempt.id, attempt.deadline, lambda: _auto_submit(attempt))
+    return attempt
+
+
+def new_attempt(user_id, paper, duration, db_file):
+    """Start a timed attempt on paper; auto-submitted at its deadline even if the browser is gone"""
+    attempt = Attempt(uuid.uuid4().hex, user_id, paper, time.time() + duration, db_file)
+    journal.start(db_file, attempt.id, user_id, paper.paper_id, attempt.deadline)
+    return _register(attempt)
+
+
+def _from_journal(entry, paper, db_file):
+    attempt = Attempt(entry["id"], entry["user_id"], paper, entry["deadline"], db_file)
+    index = {q[0]: i for i, q in enumerate(paper.questions)}
+    for q_id, selected in entry["answers"].items():
+        if q_id in index and selected in OPTIONS:
+            attempt.selections[index[q_id]] = ord(selected)
+    for q_id in entry["marked"]:
+        if q_id in index:
+            i = index[q_id]
+            attempt.marks[i >> 3] |= 1 << (i & 7)
+    attempt.current_q = min(entry["current_q"], max(len(paper.questions) - 1, 0))
+    return attempt
+
+
+def resume_attempt(user_id, paper, db_file):
+    """The user's unsubmitted attempt on paper (live in this process or journaled), or None"""
+    with _live_lock:
+        for attempt in _live.values():
+            if attempt.user_id == user_id and attempt.paper_id == paper.paper_id and attempt.score is None:
+                return attempt
+
+    entry = journal.load_open(db_file, user_id, paper.paper_id)
+    if entry is None:
+        return None
+    with _live_lock:
+        live = _live.get(entry["id"])  # another session of the same user got here first
+    return live or _register(_from_journal(entry, paper, db_file))
+
+
+def recover_open_attempts(db_file):
+    """Once per process: reschedule auto-submit for attempts journaled before a restart"""
+    if db_file in _recovered:
+        return
+    _recovered.add(db_file)
+    for entry in journal.load_all_open(db_file):
+        with _live_lock:
+            if entry["id"] in _live:
+                continue
+        try:
+            paper = load_paper(entry["paper_id"], db_file)
+        except Exception:
+            continue  # paper withdrawn: nothing to score against
+        _register(_from_journal(entry, paper, db_file))
+
+
+def expired(attempt):
+    return time.time() >= attempt.deadline
+
+
+# ==== ANSWER STATE (in memory at once, journaled write-behind) ====
+def save_answer(attempt, i, selected):
+    attempt.selections[i] = ord(selected)
+    journal.answer(attempt.db_file, attempt.id, attempt.questions[i][0], selected)
+
+
+def set_marked(attempt, i, marked):
+    if marked:
+        attempt.marks[i >> 3] |= 1 << (i & 7)
+    else:
+        attempt.marks[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+    journal.mark(attempt.db_file, attempt.id, attempt.questions[i][0], marked)
+
+
+def clear_marks(attempt):
+    attempt.marks[:] = bytes(len(attempt.marks))
+    journal.clear_marks(attempt.db_file, attempt.id)
+
+
+def _clock_out(attempt, now):
+    # Charge the time since the current question was shown to it
+    i = attempt.order[attempt.current_q]
+    spent = max(0, min(now, attempt.deadline) - attempt.shown_at)
+    attempt.seconds[i] = min(65535, attempt.seconds[i] + int(spent))
+    attempt.shown_at = now
+
+
+def set_position(attempt, q_idx):
+    if attempt.current_q != q_idx:
+        _clock_out(attempt, time.time())
+        attempt.current_q = q_idx
+        journal.position(attempt.db_file, attempt.id, q_idx)
+
+
+# ==== SUBMIT ====
+def score_attempt(paper, selections):
+    # Missing keys become "?", which never equals a selection byte
+    key = "".join(k or "?" for k in paper.answer_key).encode("ascii")
+    return sum(map(int.__eq__, selections, key))
+
+
+def _submit(cursor, user_id, paper, attempt_id, seed, score, answers, selections, seconds, completed):
+    question_ids = [q[0] for q in paper.questions]
+    # Keyed on the attempt id: a job that committed after write() timed out is not saved again
+    key = encode_sheet(bytes(ord(k) if k else UNANSWERED for k in paper.answer_key))  # packed like the sheet
+    if record_attempt(cursor, user_id, paper.paper_id, question_ids, encode_sheet(selections), score,
+                      seed=seed, uuid=attempt_id, answer_key=key, pinned=pinned_questions(paper)) is None:
+        return
+    record_submission(cursor, user_id, paper.paper_id, score, answers, completed=int(completed))
+    record_stats(cursor, question_ids, selections, paper.answer_key, seconds)
+    journal.close_attempt(cursor, attempt_id)
+
+
+def finalize_attempt(attempt, completed=True):
+    """Score and save the attempt exactly once, whether called by the page or the scheduler.
+
+    `completed` is False for an attempt submitted because time ran out: it
+    is kept in history but does not count as a completed paper. Runs on the
+    scheduler thread too, so it must not call any st.* function.
+    Returns True if this call did the save.
+    """
+    # Held through the save: a page that races the scheduler waits for the score
+    with attempt.lock:
+        if attempt.score is not None:
+            return False
+        attempt.submitted = True
+        scheduler.cancel(attempt.id)
+        _clock_out(attempt, time.time())
+        selections = bytes(attempt.selections)  # the page may still be writing to it
+        score = score_attempt(attempt.paper, selections)
+        answers = {q[0]: chr(code) for q, code in zip(attempt.questions, selections) if code}
+        # Single writer, FIFO: queued journal writes commit before the journal is dropped.
+        # On failure score stays None, so the page can retry the save
+        write(_submit, attempt.user_id, attempt.paper, attempt.id, attempt.seed, score, answers,
+              selections, attempt.seconds.tolist(), completed, db_file=attempt.db_file, label="attempt.finalize")
+        attempt.score = score
+    with _live_lock:
+        _live.pop(attempt.id, None)
+    return True
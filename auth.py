@@ -0,0 +1,227 @@
+# auth.py
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
+from datetime import datetime, date, time as dtime
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from db.db_connection import get_db_connection
+
+# ==== CONFIG ====
+# Must be identical on every replica for tokens to survive a replica hop
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    SESSION_SECRET = secrets.token_hex(32)
+    print("⚠⚠ SESSION_SECRET is not set: using a random per-process key. Logins will NOT survive a "
+          "restart or a hop to another replica. Set SESSION_SECRET to the same value on every replica.",
+          file=sys.stderr, flush=True)
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(8 * 3600)))  # seconds
+SESSION_RECHECK = int(os.getenv("SESSION_RECHECK", "300"))   # seconds between account re-checks
+RECHECK_RETRY = 30  # seconds before retrying a re-check that could not reach Postgres
+APP_SLUG = os.getenv("APP_SLUG", "nism-test")
+COOKIE_NAME = "nism_session"
+QUERY_PARAM = "session"  # only read (links from before the cookie), then stripped from the URL
+
+# Logged-out tokens until they expire: shared by every replica through Postgres
+SESSIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS revoked_sessions (
+        token_id TEXT PRIMARY KEY,
+        expires_at TIMESTAMPTZ NOT NULL
+    )
+"""
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload):
+    return hmac.new(SESSION_SECRET.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest()
+
+
+# ==== TOKENS ====
+def issue_token(username, valid_until=None, ttl=SESSION_TTL):
+    """HMAC-signed token for username, expiring after ttl or at the end of valid_until"""
+    expires = int(time.time()) + ttl
+    if isinstance(valid_until, date):
+        expires = min(expires, int(datetime.combine(valid_until, dtime.max).timestamp()))
+    claims = {"u": username, "exp": expires, "jti": secrets.token_urlsafe(12)}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_b64encode(_sign(payload))}"
+
+
+def token_claims(token):
+    """Claims of a validly signed, unexpired token, else None (no DB access)"""
+    try:
+        payload, signature = token.split(".", 1)
+        if not hmac.compare_digest(_b64decode(signature), _sign(payload)):
+            return None
+        data = json.loads(_b64decode(payload))
+    except Exception:
+        return None
+    if data.get("exp", 0) < time.time():
+        return None
+    return data
+
+
+def verify_token(token):
+    """Return the username in a valid, unexpired token, else None (no DB access)"""
+    claims = token_claims(token)
+    return claims.get("u") if claims else None
+
+
+# ==== SERVER-SIDE CHECKS ====
+def _ensure_schema(cur):
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                cur.execute(SESSIONS_SCHEMA)
+                _schema_ready = True
+
+
+def account_allows(claims):
+    """True if the token was not revoked and its account is still active and paid up.
+
+    One Postgres round trip: run when a session is restored from a token and
+    every SESSION_RECHECK seconds after, not on every script run.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            _ensure_schema(cur)
+            cur.execute("""
+                SELECT u.is_active, u.valid_until,
+                       EXISTS (SELECT 1 FROM revoked_sessions r WHERE r.token_id = %s)
+                FROM users u
+                WHERE u.username = %s AND u.app_slug = %s
+            """, (claims.get("jti", ""), claims.get("u"), APP_SLUG))
+            row = cur.fetchone()
+        conn.commit()
+    if not row:
+        return False
+    is_active, valid_until, revoked = row
+    return bool(is_active) and not revoked and (valid_until is None or valid_until >= date.today())
+
+
+def revoke_token(token):
+    """Refuse token on every replica from now until it would have expired anyway"""
+    claims = token_claims(token or "")
+    if not claims or "jti" not in claims:
+        return
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            _ensure_schema(cur)
+            cur.execute("""
+                INSERT INTO revoked_sessions (token_id, expires_at) VALUES (%s, to_timestamp(%s))
+                ON CONFLICT (token_id) DO NOTHING
+            """, (claims["jti"], claims["exp"]))
+            # Keep the table to the tokens that could still be presented
+            cur.execute("DELETE FROM revoked_sessions WHERE expires_at < now()")
+        conn.commit()
+
+
+# ==== STREAMLIT SESSION ====
+def _set_cookie(value, max_age):
+    # Streamlit can read cookies (st.context.cookies) but not set them: do it from the browser
+    components.html(f"""
+        <script>
+        // Secure whenever the page itself is served over HTTPS (also behind a TLS-terminating proxy)
+        parent.document.cookie = "{COOKIE_NAME}={value}; path=/; max-age={max_age}; SameSite=Strict"
+            + (parent.location.protocol === "https:" ? "; Secure" : "");
+        </script>
+    """, height=0)
+
+
+def _incoming_token():
+    # A token in the URL leaks through history, shared links, proxy logs and Referer:
+    # accept it once, then take it out of the address bar
+    token = st.query_params.get(QUERY_PARAM)
+    if token:
+        st.query_params.pop(QUERY_PARAM, None)
+    else:
+        try:
+            token = st.context.cookies.get(COOKIE_NAME)
+        except AttributeError:
+            token = None
+    return token
+
+
+def start_session(username, valid_until=None):
+    """Mark the session logged in; the browser gets the signed token as a cookie"""
+    token = issue_token(username, valid_until)
+    st.session_state.logged_in = True
+    st.session_state.user_name = username
+    st.session_state.user_id = username  # or fetch ID
+    st.session_state.session_token = token
+    st.session_state.session_checked_at = time.time()
+
+
+def restore_session():
+    """True if logged in, restoring the login from a signed token after a reconnect or replica hop"""
+    if st.session_state.get("logged_in"):
+        token = st.session_state.get("session_token")
+        claims = token_claims(token) if token else None
+        if claims is None:
+            end_session()
+            return False
+        if time.time() - st.session_state.get("session_checked_at", 0) > SESSION_RECHECK:
+            try:
+                allowed = account_allows(claims)
+            except Exception:
+                # Postgres down: keep the candidate in their exam, and retry after RECHECK_RETRY
+                # rather than waiting on the pool and connect timeouts on every run
+                allowed = True
+                st.session_state.session_checked_at = time.time() - SESSION_RECHECK + RECHECK_RETRY
+            else:
+                st.session_state.session_checked_at = time.time()
+            if not allowed:
+                end_session()
+                return False
+        # Set the cookie once per session, from a page that is not about to switch away
+        if not st.session_state.get("session_cookie_set"):
+            _set_cookie(token, SESSION_TTL)
+            st.session_state.session_cookie_set = True
+        return True
+
+    token = _incoming_token()
+    claims = token_claims(token) if token else None
+    if not claims:
+        return False
+    try:
+        if not account_allows(claims):
+            return False
+    except Exception:
+        return False
+
+    st.session_state.logged_in = True
+    st.session_state.user_name = claims["u"]
+    st.session_state.user_id = claims["u"]
+    st.session_state.session_token = token
+    st.session_state.session_checked_at = time.time()
+    return True
+
+
+def end_session():
+    token = st.session_state.get("session_token")
+    st.session_state.clear()
+    st.query_params.pop(QUERY_PARAM, None)
+    _set_cookie("", 0)
+    if token:
+        try:
+            revoke_token(token)
+        except Exception as e:
+            print(f"⚠ Could not revoke session token: {e}", file=sys.stderr)
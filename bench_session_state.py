@@ -0,0 +1,86 @@
+import gc
+import time
+import random
+import marshal
+import argparse
+import tracemalloc
+
+from db.snapshots import Paper
+from attempts import Attempt, OPTIONS
+
+# ==== CONFIG ====
+SESSIONS = 500
+QUESTIONS = 100
+EXPLANATION_WORDS = 60  # typical generated explanations are a paragraph
+MARKED_SHARE = 0.1
+
+
+# ==== SYNTHETIC PAPER ====
+def make_paper(n, seed=42):
+    rnd = random.Random(seed)
+    questions = tuple(
+        (i + 1, f"Synthetic question {i}: which statement about item {rnd.random():.6f} is correct?",
+         *(f"Option {k} for question {i}, worded like a real option" for k in OPTIONS),
+         rnd.choice(OPTIONS), " ".join(["explanation"] * EXPLANATION_WORDS))
+        for i in range(n)
+    )
+    return Paper(1, "Synthetic", "mock", "", questions, tuple(q[6] for q in questions))
+
+
+# ==== LEGACY STATE (private question copy + one dict per saved answer) ====
+def legacy_session(paper, rnd):
+    questions = marshal.loads(marshal.dumps(paper.questions))  # fresh objects, like a per-session fetchall
+    answers, marked = {}, {}
+    for q_id, _, a, b, c, d, correct_opt, explanation in questions:
+        options_map = {"A": a, "B": b, "C": c, "D": d}
+        selected = rnd.choice(OPTIONS)
+        answers[q_id] = {
+            "selected": selected,
+            "selected_text": options_map[selected],
+            "correct": correct_opt,
+            "correct_text": options_map.get(correct_opt, ""),
+            "explanation": explanation
+        }
+        if rnd.random() < MARKED_SHARE:
+            marked[q_id] = True
+    return {"questions": questions, "answers": answers, "marked": marked}
+
+
+# ==== COMPACT STATE (attempts.Attempt over the shared paper) ====
+def compact_session(paper, rnd):
+    attempt = Attempt(f"{rnd.getrandbits(128):032x}", "user@example.com", paper, time.time() + 1200, "bench.db")
+    for i in range(len(paper.questions)):
+        attempt.selections[i] = ord(rnd.choice(OPTIONS))
+        if rnd.random() < MARKED_SHARE:
+            attempt.marks[i >> 3] |= 1 << (i & 7)
+    return attempt
+
+
+def measure(label, sessions, build):
+    rnd = random.Random(7)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    held = [build(rnd) for _ in range(sessions)]
+    elapsed = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{label:<28} {sessions:>5} sessions  {used / 2**20:8.2f} MiB  "
+          f"{used / sessions / 1024:8.1f} KiB/session  {elapsed:6.2f}s")
+    del held
+    return used
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-session exam state memory")
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    parser.add_argument("--questions", type=int, default=QUESTIONS)
+    args = parser.parse_args()
+
+    paper = make_paper(args.questions)
+    print(f"Paper: {args.questions} questions, every question answered, {MARKED_SHARE:.0%} marked")
+    legacy = measure("legacy dict state", args.sessions, lambda rnd: legacy_session(paper, rnd))
+    compact = measure("compact Attempt", args.sessions, lambda rnd: compact_session(paper, rnd))
+    print(f"→ {legacy / compact:.0f}x less memory per session")
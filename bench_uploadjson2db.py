@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+import uploadjson2db
+
+# ==== CONFIG ====
+ROWS = 100_000  # Size of the synthetic question bank
+LEGACY_ROWS = 5_000  # The per-row path is quadratic, so benchmark it on a smaller bank
+TOPICS = ["Derivatives", "Options", "Futures", "Risk Management", "Regulation", "Clearing"]
+
+
+# ==== SYNTHETIC BANK ====
+def write_bank(path, n, seed=42):
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            options = [f"Option {k} for question {i}" for k in "ABCD"]
+            f.write(json.dumps({
+                "question_number": str(i + 1),
+                "question_text": f"Synthetic question {i}: what is the value of item {rnd.random():.6f}?",
+                "options": options,
+                "correct_answer": rnd.choice(options),
+                "explanation": "Synthetic explanation " * 8,
+                "topic": rnd.choice(TOPICS),
+            }) + "\n")
+
+
+# ==== LEGACY PATH (per-row SELECT then INSERT/UPDATE, no index) ====
+def legacy_load(db_file, records):
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question TEXT NOT NULL,
+            option_a TEXT, option_b TEXT, option_c TEXT, option_d TEXT,
+            correct_answer TEXT, correct_option CHAR(1), explanation TEXT, topic TEXT
+        )
+    """)
+    for q in records:
+        row = uploadjson2db.to_row(q)[:9]
+        cursor.execute("SELECT id FROM questions WHERE question = ?", (row[0],))
+        existing = cursor.fetchone()
+        if existing:
+            cursor.execute("""
+                UPDATE questions
+                SET option_a=?, option_b=?, option_c=?, option_d=?,
+                    correct_answer=?, correct_option=?, explanation=?, topic=?
+                WHERE id=?
+            """, (*row[1:], existing[0]))
+        else:
+            cursor.execute("""
+                INSERT INTO questions
+                (question, option_a, option_b, option_c, option_d,
+                 correct_answer, correct_option, explanation, topic)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, row)
+    conn.commit()
+    conn.close()
+
+
+def timed(label, n, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {n:>8} rows  {elapsed:7.2f}s  {n / elapsed:>10,.0f} rows/s")
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark uploadjson2db bulk upsert")
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--legacy-rows", type=int, default=LEGACY_ROWS)
+    parser.add_argument("--batch-size", type=int, default=uploadjson2db.BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = os.path.join(tmp, "bank.jsonl")
+        write_bank(bank, args.rows)
+
+        uploadjson2db.DB_FILE = os.path.join(tmp, "bulk.db")
+        uploadjson2db.create_db()
+        load = lambda: uploadjson2db.insert_or_update(
+            uploadjson2db.iter_records(bank), batch_size=args.batch_size, progress_every=0)
+
+        timed("bulk upsert (fresh insert)", args.rows, load)
+        timed("bulk upsert (all conflicts)", args.rows, load)
+
+        if args.legacy_rows:
+            legacy_bank = list(uploadjson2db.iter_records(bank))[:args.legacy_rows]
+            legacy_db = os.path.join(tmp, "legacy.db")
+            timed("legacy per-row (fresh insert)", len(legacy_bank),
+                  lambda: legacy_load(legacy_db, legacy_bank))
+            timed("legacy per-row (all conflicts)", len(legacy_bank),
+                  lambda: legacy_load(legacy_db, legacy_bank))
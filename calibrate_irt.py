@@ -0,0 +1,170 @@
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+
+from db.migrations import migrate
+
+# ==== CONFIG ====
+MASTER_DB = "master_questions.db"
+MIN_RESPONSES = 20     # questions with fewer answers keep no parameters
+MAX_ITERS = 200
+TOLERANCE = 1e-3       # stop when no parameter moves more than this
+PRIOR_SD_B = 2.0       # difficulty ~ N(0, 2^2)
+PRIOR_SD_LOG_A = 0.5   # log discrimination ~ N(0, 0.5^2)
+
+
+# ==== DATA ====
+def load_responses(conn, min_responses=MIN_RESPONSES):
+    """Sparse user x question matrix as parallel arrays (users, items, correct) plus the id maps"""
+    rows = conn.execute("""
+        SELECT ua.user_id, ua.question_id, ua.selected_option = q.correct_option
+        FROM user_answers ua
+        JOIN questions q ON q.id = ua.question_id
+        WHERE ua.selected_option IS NOT NULL AND q.correct_option IS NOT NULL
+    """).fetchall()
+    if not rows:
+        return None
+    user_ids, question_ids, correct = zip(*rows)
+    question_ids = np.fromiter(question_ids, dtype=np.int64, count=len(rows))
+    correct = np.fromiter(correct, dtype=np.float64, count=len(rows))
+
+    # Drop sparsely answered questions before indexing so they do not distort the scale
+    item_keys, item_idx, item_counts = np.unique(question_ids, return_inverse=True, return_counts=True)
+    keep = item_counts[item_idx] >= min_responses
+    user_keys, user_idx = np.unique(np.asarray(user_ids, dtype=object)[keep], return_inverse=True)
+    item_keys, item_idx = np.unique(question_ids[keep], return_inverse=True)
+    return user_idx, item_idx, correct[keep], user_keys, item_keys
+
+
+# ==== MODEL ====
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def fit(users, items, correct, n_users, n_items, model="2pl", max_iters=MAX_ITERS, tol=TOLERANCE):
+    """Joint MAP fit of P(correct) = sigmoid(a_i * (theta_u - b_i)).
+
+    Each iteration takes a clipped diagonal-Newton step for abilities, then
+    difficulties, then (2PL) log-discriminations, each computed for all
+    responses at once with the per-user / per-question sums done by
+    np.bincount. Returns (theta, b, a, iterations).
+    """
+    theta = np.zeros(n_users)
+    # Start difficulties at the logit of each question's error rate
+    p_item = (np.bincount(items, correct, n_items) + 0.5) / (np.bincount(items, minlength=n_items) + 1.0)
+    b = np.log((1 - p_item) / p_item)
+    log_a = np.zeros(n_items)
+
+    for iteration in range(1, max_iters + 1):
+        a_r = np.exp(log_a)[items]
+
+        # Abilities (prior N(0, 1) fixes the scale)
+        p = sigmoid(a_r * (theta[users] - b[items]))
+        grad = np.bincount(users, (correct - p) * a_r, n_users) - theta
+        hess = np.bincount(users, p * (1 - p) * a_r * a_r, n_users) + 1.0
+        step_theta = np.clip(grad / hess, -1.0, 1.0)
+        theta += step_theta
+
+        # Difficulties, against the updated abilities
+        x = theta[users] - b[items]
+        p = sigmoid(a_r * x)
+        grad = -np.bincount(items, (correct - p) * a_r, n_items) - b / PRIOR_SD_B ** 2
+        hess = np.bincount(items, p * (1 - p) * a_r * a_r, n_items) + 1.0 / PRIOR_SD_B ** 2
+        step_b = np.clip(grad / hess, -1.0, 1.0)
+        b += step_b
+
+        step_a = np.zeros(n_items)
+        if model == "2pl":
+            z = a_r * (x - step_b[items])  # logit, which is also d logit / d log_a
+            p = sigmoid(z)
+            grad = np.bincount(items, (correct - p) * z, n_items) - log_a / PRIOR_SD_LOG_A ** 2
+            hess = np.bincount(items, p * (1 - p) * z * z, n_items) + 1.0 / PRIOR_SD_LOG_A ** 2
+            step_a = np.clip(grad / hess, -0.5, 0.5)
+            log_a += step_a
+
+        if max(np.abs(step_theta).max(), np.abs(step_b).max(), np.abs(step_a).max()) < tol:
+            break
+
+    return theta, b, np.exp(log_a), iteration
+
+
+# ==== WRITE BACK ====
+def save_parameters(conn, model, item_keys, b, a, counts):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM question_irt")
+        conn.executemany("""
+            INSERT INTO question_irt (question_id, model, difficulty, discrimination, responses, calibrated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, zip(item_keys.tolist(), [model] * len(item_keys), b.tolist(), a.tolist(), counts.tolist(),
+                 [now] * len(item_keys)))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def calibrate(db_file=MASTER_DB, model="2pl", min_responses=MIN_RESPONSES, max_iters=MAX_ITERS):
+    migrate(db_file)
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        started = time.perf_counter()
+        data = load_responses(conn, min_responses)
+        if data is None:
+            print("⚠ No responses to calibrate from")
+            return 0
+        users, items, correct, user_keys, item_keys = data
+        if not len(items):
+            print(f"⚠ No question has {min_responses}+ responses yet")
+            return 0
+        loaded = time.perf_counter()
+
+        _, b, a, iterations = fit(users, items, correct, len(user_keys), len(item_keys), model, max_iters)
+        fitted = time.perf_counter()
+
+        save_parameters(conn, model, item_keys, b, a, np.bincount(items, minlength=len(item_keys)))
+        print(f"✅ {model.upper()}: {len(item_keys)} questions, {len(user_keys)} users, {len(items):,} responses "
+              f"(load {loaded - started:.2f}s, fit {fitted - loaded:.2f}s in {iterations} iterations)")
+        return len(item_keys)
+    finally:
+        conn.close()
+
+
+# ==== SIMULATION (speed / recovery check, no DB) ====
+def simulate(n_users, n_items, per_user, model="2pl", seed=0):
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0, 1, n_users)
+    b = rng.normal(0, 1, n_items)
+    a = np.exp(rng.normal(0, 0.3, n_items)) if model == "2pl" else np.ones(n_items)
+    users = np.repeat(np.arange(n_users), per_user)
+    items = np.concatenate([rng.choice(n_items, per_user, replace=False) for _ in range(n_users)])
+    correct = (rng.random(len(users)) < sigmoid(a[items] * (theta[users] - b[items]))).astype(np.float64)
+
+    started = time.perf_counter()
+    est_theta, est_b, est_a, iterations = fit(users, items, correct, n_users, n_items, model)
+    elapsed = time.perf_counter() - started
+    print(f"{model.upper()}: {len(users):,} responses, {n_users} users x {n_items} questions "
+          f"→ fit {elapsed:.2f}s in {iterations} iterations")
+    print(f"   corr(difficulty) {np.corrcoef(b, est_b)[0, 1]:.3f}  "
+          f"corr(ability) {np.corrcoef(theta, est_theta)[0, 1]:.3f}"
+          + (f"  corr(discrimination) {np.corrcoef(a, est_a)[0, 1]:.3f}" if model == "2pl" else ""))
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit 1PL/2PL IRT question parameters from user_answers")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    parser.add_argument("--model", choices=["1pl", "2pl"], default="2pl")
+    parser.add_argument("--min-responses", type=int, default=MIN_RESPONSES)
+    parser.add_argument("--max-iters", type=int, default=MAX_ITERS)
+    parser.add_argument("--simulate", type=int, nargs=3, metavar=("USERS", "QUESTIONS", "PER_USER"),
+                        help="Fit synthetic responses instead of the DB and report recovery")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(*args.simulate, model=args.model)
+    else:
+        calibrate(args.db_file, args.model, args.min_responses, args.max_iters)
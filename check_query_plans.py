@@ -0,0 +1,172 @@
+import re
+import sys
+import shutil
+import argparse
+import sqlite3
+import tempfile
+import os
+
+from db.migrations import migrate
+
+# ==== CONFIG ====
+MASTER_DB = "master_questions.db"
+
+# The queries the pages run on every load, with representative parameters
+HOT_QUERIES = {
+    "cache.versions (every cached read)": ("""
+        SELECT name, version FROM data_versions
+    """, ()),
+    "3_Test.get_questions": ("""
+        SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation
+        FROM questions
+        WHERE paper_id = ? AND retired_at IS NULL
+        ORDER BY id
+    """, (1,)),
+    "3_Test.save_user_progress (answers)": ("""
+        INSERT OR REPLACE INTO user_answers (user_id, question_id, selected_option)
+        VALUES (?, ?, ?)
+    """, ("user@example.com", 1, "A")),
+    "4_Result.get_attempt (history.load_attempt)": ("""
+        SELECT a.user_id, a.paper_id, a.submitted_at, a.score, a.seed, l.question_ids, a.sheet,
+               a.answer_key, a.pinned
+        FROM attempts a
+        JOIN paper_layouts l ON l.layout_id = a.layout_id
+        WHERE a.attempt_id = ?
+    """, (1,)),
+    "4_Result.get_answer_key": ("""
+        SELECT q.id, q.correct_option, IFNULL(q.topic, ''), q.option_a, q.option_b, q.option_c, q.option_d
+        FROM questions q
+        WHERE q.id IN (?, ?, ?)
+    """, (1, 2, 3)),
+    "4_Result.get_result_rows": ("""
+        SELECT q.id, q.question, q.option_a, q.option_b, q.option_c, q.option_d,
+               IFNULL(s.attempts, 0), IFNULL(s.correct, 0), IFNULL(s.seconds, 0)
+        FROM questions q
+        LEFT JOIN question_stats s ON s.question_id = q.id
+        WHERE q.id IN (?, ?, ?)
+        ORDER BY q.id
+    """, (1, 2, 3)),
+    "4_Result.get_related": ("""
+        SELECT q.question, IFNULL(q.topic, ''), IFNULL(p.title, '')
+        FROM question_neighbours n
+        JOIN questions q ON q.id = n.neighbour_id
+        LEFT JOIN papers p ON p.paper_id = q.paper_id
+        WHERE n.question_id = ? AND q.retired_at IS NULL
+        ORDER BY n.rank
+        LIMIT ?
+    """, (1, 5)),
+    "4_Result.get_attempt_history": ("""
+        SELECT attempt_id, submitted_at, score, answered, length(sheet), seed
+        FROM attempts
+        WHERE user_id = ? AND paper_id = ?
+        ORDER BY attempt_id DESC
+        LIMIT ?
+    """, ("user@example.com", 1, 10)),
+    "4_Result.get_explanation": ("""
+        SELECT explanation FROM questions WHERE id = ?
+    """, (1,)),
+    "2_Dashboard.get_catalogue": ("""
+        SELECT paper_id, title, type, instructions, total_questions
+        FROM papers
+        ORDER BY type, paper_id
+    """, ()),
+    "2_Dashboard.get_topic_stats": ("""
+        SELECT topic, attempts, answered, correct, seconds FROM topic_stats
+    """, ()),
+    "2_Dashboard.get_user_summary": ("""
+        SELECT progress, mocks_completed FROM user_summary WHERE user_id = ?
+    """, ("user@example.com",)),
+    "3_Test.resume_attempt": ("""
+        SELECT attempt_id, user_id, paper_id, deadline, current_q
+        FROM attempt_journal
+        WHERE user_id = ? AND paper_id = ?
+        ORDER BY deadline DESC
+        LIMIT 1
+    """, ("user@example.com", 1)),
+    "3_Test.resume_attempt (answers)": ("""
+        SELECT question_id, selected_option, marked
+        FROM attempt_journal_answers
+        WHERE attempt_id = ?
+    """, ("0" * 32,)),
+    "papergen.find_paper": ("""
+        SELECT paper_id FROM generated_papers WHERE seed = ? AND spec = ?
+    """, (42, "{}")),
+    "6_Search.count_matches": ("""
+        SELECT COUNT(*)
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH ? AND q.retired_at IS NULL
+    """, ('"cost" "of" "carry"*',)),
+    "6_Search.search_questions": ("""
+        SELECT q.id, q.paper_id, q.topic,
+               highlight(questions_fts, 0, '**', '**'),
+               snippet(questions_fts, 5, '**', '**', ' … ', 16)
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH ? AND q.retired_at IS NULL
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """, ('"cost" "of" "carry"*', 10, 0)),
+    "5_Practice.load_mastery": ("""
+        SELECT topic, mastery FROM user_topic_mastery WHERE user_id = ?
+    """, ("user@example.com",)),
+    "5_Practice.due_reviews": ("""
+        SELECT question_id FROM user_question_review
+        WHERE user_id = ? AND due_at <= ?
+        ORDER BY due_at
+        LIMIT ?
+    """, ("user@example.com", 0.0, 20)),
+    "5_Practice.get_question": ("""
+        SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation,
+               IFNULL(topic, '')
+        FROM questions
+        WHERE id = ? AND retired_at IS NULL
+    """, (1,)),
+}
+
+# A bare "SCAN <table>" (no index) or an explicit sort means the query degrades with table size
+BAD_PLAN = re.compile(r"^(SCAN \w+( AS \w+)?$|USE TEMP B-TREE)")
+
+# Tables bounded by something other than users / attempts / questions: scanning them is fine
+SMALL_TABLES = {"topic_stats", "data_versions"}  # one row per topic / per counter
+
+
+def plan_problems(conn, sql, params):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    details = [r[-1] for r in rows]
+    return details, [d for d in details if BAD_PLAN.match(d) and d.split()[1] not in SMALL_TABLES]
+
+
+def check(db_file, verbose=False):
+    conn = sqlite3.connect(db_file)
+    failures = 0
+    for name, (sql, params) in HOT_QUERIES.items():
+        details, problems = plan_problems(conn, sql, params)
+        status = "❌" if problems else "✅"
+        print(f"{status} {name}")
+        if problems or verbose:
+            for d in details:
+                print(f"     {d}")
+        failures += bool(problems)
+    conn.close()
+    return failures
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a hot query falls back to a full table scan")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Check a migrated copy so the real DB is never modified by this script
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = os.path.join(tmp, os.path.basename(args.db_file))
+        shutil.copyfile(args.db_file, db_copy)
+        migrate(db_copy)
+        failures = check(db_copy, verbose=args.verbose)
+
+    if failures:
+        print(f"❌ {failures} hot query plan(s) use a full table scan or temp sort")
+        sys.exit(1)
+    print("✅ All hot queries use indexes")
@@ -0,0 +1,133 @@
+# db/cache.py
+import os
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+
+from db.sqlite_connection import query
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+PAPER_CACHE_SIZE = int(os.getenv("PAPER_CACHE_SIZE", "64"))
+
+# Change counters in data_versions that cached reads depend on
+BANK = "bank"        # questions and papers (triggers), plus data derived from them offline
+RESULTS = "results"  # submitted attempts: user_answers, attempt history, running stats
+
+# Applied to the master DB as migration 16: change it with a new migration, not in place.
+# Row triggers bump the counters for every writer (merges, loaders, generated papers, edits).
+# Per-user exam traffic (journal, writer saves, practice) never touches them.
+BUMP = "UPDATE data_versions SET version = version + 1 WHERE name = ?"
+VERSION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    f"INSERT OR IGNORE INTO data_versions (name) VALUES ('{BANK}'), ('{RESULTS}')",
+    *(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table} BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = '{name}';
+        END
+        """
+        for table, name, events in (
+            ("questions", BANK, ("INSERT", "UPDATE", "DELETE")),
+            ("papers", BANK, ("INSERT", "UPDATE", "DELETE")),
+            ("attempts", RESULTS, ("INSERT",)),
+        )
+        for event in events
+    ),
+]
+
+
+def data_versions(db_file, names):
+    """Current counters for names; the file signature on a DB from before data_versions"""
+    try:
+        versions = dict(query("SELECT name, version FROM data_versions", db_file=db_file,
+                              label="cache.versions"))
+    except sqlite3.OperationalError:
+        return file_signature(db_file)
+    return tuple(versions.get(name) for name in names)
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a SQLite file and its WAL; changes on any write to the DB"""
+    sig = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU map whose entries carry a validity signature"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, signature):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == signature:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, signature, value):
+        with self._lock:
+            self._data[key] = (signature, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses}
+
+
+query_cache = LRUCache(QUERY_CACHE_SIZE)
+
+
+def cached_query(db_file, depends=(BANK,), cache=query_cache):
+    """Share a read helper's result across all sessions in the process.
+
+    Results are keyed by function and arguments and are recomputed as soon as
+    one of the data_versions counters in depends moves, so reloading the bank
+    needs no restart while answer saves and journal writes leave the cache warm.
+    Cached results are shared: callers must not mutate them.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = (name, db_file, args)
+            signature = data_versions(db_file, depends)
+            hit, value = cache.get(key, signature)
+            if hit:
+                return value
+            value = fn(*args)
+            if isinstance(value, list):
+                value = tuple(value)
+            cache.put(key, signature, value)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
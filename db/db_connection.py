@@ -2,6 +2,10 @@
 import psycopg2
 import bcrypt
 from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
@@ -15,27 +19,206 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME"),     # usually "postgres"
     "user": os.getenv("DB_USER"),         # e.g., "postgres"
     "password": os.getenv("DB_PASS"),
-    "port": 5432,
-    "sslmode": "require"  # Supabase requires SSL
+    "port": int(os.getenv("DB_PORT", "5432")),
+    "sslmode": os.getenv("DB_SSLMODE", "require")  # Supabase requires SSL
 }
 
+# Connection pool config
+POOL_ENABLED = os.getenv("DB_POOL", "1") == "1"
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))        # seconds to wait for a free connection
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))     # recycle connections idle this long
+POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))  # ping if idle this long
+
+# bcrypt worker pool config
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))  # queued + running checks
+BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "15"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe psycopg2 connection pool.
+
+    Blocks (up to `timeout`) when all `maxconn` connections are in use,
+    pings connections that sat idle before handing them out and closes
+    connections idle for longer than `max_idle`.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, max_idle, healthcheck_after, **config):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.healthcheck_after = healthcheck_after
+        self.config = config
+        self._idle = deque()  # (conn, returned_at), most recently used on the right
+        self._size = 0        # open connections, idle + in use
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return psycopg2.connect(**self.config)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                self._recycle_idle()
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                elif self._size < self.maxconn:
+                    self._size += 1
+                    conn = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection free within {self.timeout}s")
+                    self._cond.wait(remaining)
+                    continue
+
+            # Connect / health-check outside the lock
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if self._healthy(conn, time.monotonic() - returned_at):
+                return conn
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+
+    def putconn(self, conn, broken=False):
+        if not broken and not conn.closed:
+            try:
+                # Never hand out a connection with an open transaction
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                broken = True
+        if broken or conn.closed:
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _recycle_idle(self):
+        # Oldest idle connections are on the left; keep at least minconn open
+        now = time.monotonic()
+        while self._idle and self._size > self.minconn and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._discard(conn)
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.popleft()[0])
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"open": self._size, "idle": len(self._idle), "max": self.maxconn}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(POOL_MIN, POOL_MAX, POOL_TIMEOUT, POOL_MAX_IDLE,
+                                       POOL_HEALTHCHECK_AFTER, **DB_CONFIG)
+    return _pool
+
+
 @contextmanager
 def get_db_connection():
-    conn = None
+    if not POOL_ENABLED:
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            yield conn
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            raise e
+        finally:
+            if conn:
+                conn.close()
+        return
+
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise e
     finally:
-        if conn:
-            conn.close()
+        pool.putconn(conn, broken=broken)
 
 def hash_password(password):
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+# bcrypt is deliberately slow: run it on a small bounded pool so a login burst
+# is capped at BCRYPT_WORKERS cores instead of stalling every script thread
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+def check_password(plain_password, hashed_password, timeout=BCRYPT_TIMEOUT):
+    """verify_password on the bounded bcrypt worker pool instead of the calling script thread"""
+    if not _bcrypt_slots.acquire(timeout=timeout):
+        raise TimeoutError("Too many logins in progress, please retry")
+    try:
+        future = _bcrypt_pool.submit(verify_password, plain_password, hashed_password)
+    except Exception:
+        _bcrypt_slots.release()
+        raise
+    future.add_done_callback(lambda _: _bcrypt_slots.release())
+    return future.result(timeout=timeout)
@@ -0,0 +1,87 @@
+# db/history.py
+import time
+import hashlib
+from array import array
+
+# Answer sheets: one byte per question in paper order, b"A".."D" or b"-" if unanswered.
+# Encoded / decoded with bytes.translate, i.e. one C-level pass over the whole sheet.
+UNANSWERED = b"-"
+ENCODE = bytes(UNANSWERED[0] if b == 0 else b for b in range(256))   # selections (0 = none) -> sheet
+DECODE = bytes(0 if b == UNANSWERED[0] else b for b in range(256))   # sheet -> selections
+ID_TYPE = "q"  # question ids are stored as little-endian int64
+
+
+# ==== ENCODING ====
+def encode_sheet(selections):
+    """bytes/bytearray of ord(letter) or 0 per question -> packed sheet"""
+    return bytes(selections).translate(ENCODE)
+
+
+def decode_sheet(sheet):
+    """Packed sheet -> bytes of ord(letter) or 0 per question"""
+    return bytes(sheet).translate(DECODE)
+
+
+def pack_ids(question_ids):
+    ids = array(ID_TYPE, question_ids)
+    if ids.itemsize != 8:
+        raise ValueError("question ids need a 64-bit array type")
+    return ids.tobytes()
+
+
+def unpack_ids(blob):
+    ids = array(ID_TYPE)
+    ids.frombytes(blob)
+    return ids
+
+
+def sheet_answers(question_ids, sheet):
+    """Packed sheet -> {question_id: letter} for the answered questions"""
+    return {q_id: chr(code) for q_id, code in zip(question_ids, decode_sheet(sheet)) if code}
+
+
+# ==== WRITES (inside the submit transaction) ====
+def record_attempt(cursor, user_id, paper_id, question_ids, sheet, score, submitted_at=None, seed=None,
+                   uuid=None, answer_key=None, pinned=None):
+    """Append one attempt; the paper's question order is stored once per distinct layout.
+
+    The sheet and answer_key are in paper order with canonical letters (packed
+    like sheets); seed and pinned reproduce the order and options the
+    candidate saw (shuffle.layout). Returns the new attempt_id, or None if an
+    attempt with this uuid was already recorded.
+    """
+    ids_blob = pack_ids(question_ids)
+    digest = hashlib.sha1(ids_blob).digest()
+    row = cursor.execute("SELECT layout_id FROM paper_layouts WHERE digest = ?", (digest,)).fetchone()
+    if row:
+        layout_id = row[0]
+    else:
+        cursor.execute("INSERT INTO paper_layouts (digest, question_ids) VALUES (?, ?)", (digest, ids_blob))
+        layout_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO attempts (user_id, paper_id, layout_id, submitted_at, score, answered, sheet, seed, uuid,
+                              answer_key, pinned)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(uuid) DO NOTHING
+    """, (user_id, paper_id, layout_id, submitted_at or time.time(), score,
+          len(sheet) - sheet.count(UNANSWERED), sheet, seed, uuid, answer_key, pinned))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+# ==== READS ====
+def load_attempt(conn, attempt_id):
+    """(user_id, paper_id, submitted_at, score, seed, question ids in sheet order, {question_id: letter},
+    {question_id: correct letter}, pinned bytes) or None; the last two are None for older attempts"""
+    row = conn.execute("""
+        SELECT a.user_id, a.paper_id, a.submitted_at, a.score, a.seed, l.question_ids, a.sheet,
+               a.answer_key, a.pinned
+        FROM attempts a
+        JOIN paper_layouts l ON l.layout_id = a.layout_id
+        WHERE a.attempt_id = ?
+    """, (attempt_id,)).fetchone()
+    if row is None:
+        return None
+    user_id, paper_id, submitted_at, score, seed, ids_blob, sheet, key, pinned = row
+    question_ids = tuple(unpack_ids(ids_blob))
+    return (user_id, paper_id, submitted_at, score, seed, question_ids, sheet_answers(question_ids, sheet),
+            None if key is None else sheet_answers(question_ids, key), pinned)
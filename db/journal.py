@@ -0,0 +1,106 @@
+# db/journal.py
+from db.sqlite_connection import query
+from db.writer import get_writer
+
+MASTER_DB = "master_questions.db"
+
+START_SQL = """
+    INSERT OR IGNORE INTO attempt_journal (attempt_id, user_id, paper_id, deadline)
+    VALUES (?, ?, ?, ?)
+"""
+ANSWER_SQL = """
+    INSERT INTO attempt_journal_answers (attempt_id, question_id, selected_option)
+    VALUES (?, ?, ?)
+    ON CONFLICT(attempt_id, question_id) DO UPDATE SET selected_option = excluded.selected_option
+"""
+MARK_SQL = """
+    INSERT INTO attempt_journal_answers (attempt_id, question_id, marked)
+    VALUES (?, ?, ?)
+    ON CONFLICT(attempt_id, question_id) DO UPDATE SET marked = excluded.marked
+"""
+CLEAR_MARKS_SQL = "UPDATE attempt_journal_answers SET marked = 0 WHERE attempt_id = ?"
+POSITION_SQL = "UPDATE attempt_journal SET current_q = ? WHERE attempt_id = ?"
+
+
+def _logged(future):
+    if future.exception() is not None:
+        print(f"❌ Journal write failed: {future.exception()}")
+
+
+def _enqueue(db_file, sql, params, label):
+    # Write-behind: the writer thread commits it with whatever else is queued
+    get_writer(db_file).execute(sql, params, label=label).add_done_callback(_logged)
+
+
+# ==== WRITES (non-blocking) ====
+def start(db_file, attempt_id, user_id, paper_id, deadline):
+    _enqueue(db_file, START_SQL, (attempt_id, user_id, paper_id, deadline), "journal.start")
+
+
+def answer(db_file, attempt_id, question_id, selected):
+    _enqueue(db_file, ANSWER_SQL, (attempt_id, question_id, selected), "journal.answer")
+
+
+def mark(db_file, attempt_id, question_id, marked):
+    _enqueue(db_file, MARK_SQL, (attempt_id, question_id, int(marked)), "journal.mark")
+
+
+def clear_marks(db_file, attempt_id):
+    _enqueue(db_file, CLEAR_MARKS_SQL, (attempt_id,), "journal.clear_marks")
+
+
+def position(db_file, attempt_id, current_q):
+    _enqueue(db_file, POSITION_SQL, (current_q, attempt_id), "journal.position")
+
+
+def flush(db_file, timeout=5):
+    """Block until every queued journal write is committed"""
+    return get_writer(db_file).flush(timeout)
+
+
+def close_attempt(cursor, attempt_id):
+    """Drop a submitted attempt's journal (call inside the submit transaction)"""
+    cursor.execute("DELETE FROM attempt_journal_answers WHERE attempt_id = ?", (attempt_id,))
+    cursor.execute("DELETE FROM attempt_journal WHERE attempt_id = ?", (attempt_id,))
+
+
+# ==== READS ====
+def _load(db_file, header):
+    attempt_id, user_id, paper_id, deadline, current_q = header
+    rows = query("""
+        SELECT question_id, selected_option, marked
+        FROM attempt_journal_answers
+        WHERE attempt_id = ?
+    """, (attempt_id,), db_file=db_file, readonly=False, label="journal.load_answers")
+    return {
+        "id": attempt_id,
+        "user_id": user_id,
+        "paper_id": paper_id,
+        "deadline": deadline,
+        "current_q": current_q,
+        "answers": {q_id: selected for q_id, selected, _ in rows if selected},
+        "marked": {q_id: True for q_id, _, marked in rows if marked},
+    }
+
+
+def load_open(db_file, user_id, paper_id):
+    """The user's latest journaled, unsubmitted attempt on paper_id, or None"""
+    flush(db_file)
+    header = query("""
+        SELECT attempt_id, user_id, paper_id, deadline, current_q
+        FROM attempt_journal
+        WHERE user_id = ? AND paper_id = ?
+        ORDER BY deadline DESC
+        LIMIT 1
+    """, (user_id, paper_id), db_file=db_file, readonly=False, one=True, label="journal.load_open")
+    return _load(db_file, header) if header else None
+
+
+def load_all_open(db_file):
+    """Every journaled, unsubmitted attempt (recovery after a restart)"""
+    flush(db_file)
+    headers = query("""
+        SELECT attempt_id, user_id, paper_id, deadline, current_q
+        FROM attempt_journal
+    """, db_file=db_file, readonly=False, label="journal.load_all_open")
+    return [_load(db_file, header) for header in headers]
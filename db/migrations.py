@@ -0,0 +1,365 @@
+# db/migrations.py
+import sqlite3
+import argparse
+
+from db import search
+from db.cache import VERSION_SCHEMA, BANK
+from db.questions import register_functions
+from db.snapshots import GENERATED_TYPE
+
+MASTER_DB = "master_questions.db"
+
+# Ordered list of (version, description, statements).
+# Never edit a shipped migration: append a new one instead.
+MIGRATIONS = [
+    (1, "base schema", [
+        """
+        CREATE TABLE IF NOT EXISTS papers (
+            paper_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            type TEXT NOT NULL,
+            instructions TEXT,
+            total_questions INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paper_id INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            option_a TEXT,
+            option_b TEXT,
+            option_c TEXT,
+            option_d TEXT,
+            correct_answer TEXT,
+            correct_option CHAR(1),
+            explanation TEXT,
+            topic TEXT,
+            FOREIGN KEY (paper_id) REFERENCES papers(paper_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id INTEGER NOT NULL,
+            paper_id INTEGER NOT NULL,
+            answered_count INTEGER DEFAULT 0,
+            score INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0, -- 0 = not finished, 1 = completed
+            PRIMARY KEY (user_id, paper_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS source_files (
+            file_name TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            paper_id INTEGER NOT NULL,
+            merged_at TEXT NOT NULL,
+            FOREIGN KEY (paper_id) REFERENCES papers(paper_id)
+        )
+        """,
+    ]),
+    (2, "user_answers table written by save_user_progress", [
+        """
+        CREATE TABLE IF NOT EXISTS user_answers (
+            user_id TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            selected_option CHAR(1),
+            PRIMARY KEY (user_id, question_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (3, "indexes for the Test, Result and Dashboard queries", [
+        # Test/Result: WHERE paper_id = ? ORDER BY id (rowid rides along in the index)
+        "CREATE INDEX IF NOT EXISTS idx_questions_paper ON questions(paper_id)",
+        # Dashboard: ORDER BY type, paper_id and the mock-count lookups
+        "CREATE INDEX IF NOT EXISTS idx_papers_type ON papers(type, paper_id)",
+        # Merge tool: match questions within a paper by text
+        "CREATE INDEX IF NOT EXISTS idx_questions_paper_text ON questions(paper_id, question)",
+    ]),
+    (4, "per-user progress summary maintained on submit", [
+        """
+        CREATE TABLE IF NOT EXISTS user_summary (
+            user_id TEXT PRIMARY KEY,
+            progress TEXT NOT NULL DEFAULT '{}', -- {"paper_id": [answered_count, score, completed]}
+            mocks_completed INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR REPLACE INTO user_summary (user_id, progress, mocks_completed)
+        SELECT up.user_id,
+               json_group_object(up.paper_id, json_array(up.answered_count, up.score, up.completed)),
+               SUM(p.type = 'mock' AND up.completed = 1)
+        FROM user_progress up
+        JOIN papers p ON p.paper_id = up.paper_id
+        GROUP BY up.user_id
+        """,
+    ]),
+    (5, "write-behind journal of in-progress attempts", [
+        """
+        CREATE TABLE IF NOT EXISTS attempt_journal (
+            attempt_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            paper_id INTEGER NOT NULL,
+            deadline REAL NOT NULL,  -- epoch seconds
+            current_q INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        # Resume lookup: the user's latest open attempt on a paper (rows are deleted on submit)
+        "CREATE INDEX IF NOT EXISTS idx_attempt_journal_user ON attempt_journal(user_id, paper_id, deadline)",
+        """
+        CREATE TABLE IF NOT EXISTS attempt_journal_answers (
+            attempt_id TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            selected_option CHAR(1),
+            marked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (attempt_id, question_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (6, "topic index for the Result page filters", [
+        # The per-paper topic list is answered from the index alone
+        "CREATE INDEX IF NOT EXISTS idx_questions_paper_topic ON questions(paper_id, topic)",
+    ]),
+    (7, "attempt history with packed answer sheets", [
+        """
+        CREATE TABLE IF NOT EXISTS paper_layouts (
+            layout_id INTEGER PRIMARY KEY,
+            digest BLOB NOT NULL UNIQUE,   -- sha1 of question_ids
+            question_ids BLOB NOT NULL     -- int64 little-endian, in paper order
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS attempts (
+            attempt_id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            paper_id INTEGER NOT NULL,
+            layout_id INTEGER NOT NULL REFERENCES paper_layouts(layout_id),
+            submitted_at REAL NOT NULL,    -- epoch seconds
+            score INTEGER NOT NULL,
+            answered INTEGER NOT NULL,
+            sheet BLOB NOT NULL            -- one byte per question: 'A'..'D' or '-'
+        )
+        """,
+        # History of one user on one paper, newest first
+        "CREATE INDEX IF NOT EXISTS idx_attempts_user ON attempts(user_id, paper_id, attempt_id)",
+    ]),
+    (8, "running per-question and per-topic statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,   -- submitted attempts that included the question
+            answered INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            pick_a INTEGER NOT NULL DEFAULT 0,
+            pick_b INTEGER NOT NULL DEFAULT 0,
+            pick_c INTEGER NOT NULL DEFAULT 0,
+            pick_d INTEGER NOT NULL DEFAULT 0,
+            seconds REAL NOT NULL DEFAULT 0         -- total time on the question; mean = seconds / attempts
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS topic_stats (
+            topic TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            answered INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            seconds REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        # Seed from the answers already on file (no timings for those)
+        """
+        INSERT OR REPLACE INTO question_stats
+            (question_id, attempts, answered, correct, pick_a, pick_b, pick_c, pick_d)
+        SELECT ua.question_id, COUNT(*), COUNT(ua.selected_option),
+               SUM(ua.selected_option = q.correct_option),
+               SUM(ua.selected_option = 'A'), SUM(ua.selected_option = 'B'),
+               SUM(ua.selected_option = 'C'), SUM(ua.selected_option = 'D')
+        FROM user_answers ua
+        JOIN questions q ON q.id = ua.question_id
+        GROUP BY ua.question_id
+        """,
+        """
+        INSERT OR REPLACE INTO topic_stats (topic, attempts, answered, correct)
+        SELECT q.topic, SUM(s.attempts), SUM(s.answered), SUM(s.correct)
+        FROM question_stats s
+        JOIN questions q ON q.id = s.question_id
+        WHERE q.topic IS NOT NULL AND q.topic != ''
+        GROUP BY q.topic
+        """,
+    ]),
+    (9, "IRT question parameters written by calibrate_irt.py", [
+        """
+        CREATE TABLE IF NOT EXISTS question_irt (
+            question_id INTEGER PRIMARY KEY,
+            model TEXT NOT NULL,             -- '1pl' | '2pl'
+            difficulty REAL NOT NULL,        -- b, on the ability scale
+            discrimination REAL NOT NULL,    -- a (1.0 for 1PL)
+            responses INTEGER NOT NULL,
+            calibrated_at REAL NOT NULL
+        )
+        """,
+    ]),
+    (10, "per-user topic mastery and spaced-repetition schedule for adaptive practice", [
+        """
+        CREATE TABLE IF NOT EXISTS user_topic_mastery (
+            user_id TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            mastery REAL NOT NULL,           -- running estimate of P(correct), 0..1
+            answered INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,        -- epoch seconds
+            PRIMARY KEY (user_id, topic)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_question_review (
+            user_id TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            box INTEGER NOT NULL,            -- Leitner box, index into practice.REVIEW_INTERVALS
+            due_at REAL NOT NULL,            -- epoch seconds
+            PRIMARY KEY (user_id, question_id)
+        ) WITHOUT ROWID
+        """,
+        # Due reviews of one user, oldest first
+        "CREATE INDEX IF NOT EXISTS idx_user_question_review_due ON user_question_review(user_id, due_at)",
+    ]),
+    (11, "stratified mock papers generated by papergen.py", [
+        """
+        CREATE TABLE IF NOT EXISTS generated_papers (
+            paper_id INTEGER PRIMARY KEY REFERENCES papers(paper_id),  -- papers.type = 'generated'
+            seed INTEGER NOT NULL,
+            spec TEXT NOT NULL,              -- JSON {"n": .., "mix": {band: share}}
+            created_at REAL NOT NULL         -- epoch seconds
+        )
+        """,
+        # One paper per (seed, spec): the same seed always opens the same paper
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_generated_papers_seed ON generated_papers(seed, spec)",
+        """
+        CREATE TABLE IF NOT EXISTS generated_paper_questions (
+            paper_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            PRIMARY KEY (paper_id, question_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (12, "shuffle seed of each attempt", [
+        # Question and option order are derived from it (shuffle.layout); NULL = paper order
+        "ALTER TABLE attempts ADD COLUMN seed INTEGER",
+    ]),
+    (13, "FTS5 search index over questions, options and explanations", [
+        *search.SCHEMA,
+        search.REBUILD,
+    ]),
+    (14, "related questions precomputed by similar_questions.py", [
+        """
+        CREATE TABLE IF NOT EXISTS question_neighbours (
+            question_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,           -- 0 = most similar
+            neighbour_id INTEGER NOT NULL,   -- a question from another paper
+            score REAL NOT NULL,             -- TF-IDF cosine similarity
+            PRIMARY KEY (question_id, rank)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (15, "retire questions removed from a source instead of deleting them; merge key", [
+        # Merges match a source question on (question_hash, occurrence): the nth copy of the
+        # same normalized text within the paper, so duplicated texts pair up one to one
+        "ALTER TABLE questions ADD COLUMN question_hash TEXT",
+        "ALTER TABLE questions ADD COLUMN occurrence INTEGER NOT NULL DEFAULT 0",
+        # Epoch seconds; retired questions keep their row for answers, stats and attempt history
+        "ALTER TABLE questions ADD COLUMN retired_at REAL",
+        "UPDATE questions SET question_hash = qhash(question)",
+        """
+        UPDATE questions SET occurrence = r.n
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY paper_id, question_hash ORDER BY id) - 1 AS n
+            FROM questions
+        ) r
+        WHERE questions.id = r.id AND r.n > 0
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_paper_hash ON questions(paper_id, question_hash, occurrence)",
+        # Superseded by idx_questions_paper_hash for merges
+        "DROP INDEX IF EXISTS idx_questions_paper_text",
+    ]),
+    (16, "bank and results change counters for the process-wide read caches", VERSION_SCHEMA),
+    (17, "generated papers leave the bank counter alone", [
+        # They are immutable per-user draws that no cached read lists: creating or pruning one
+        # must not invalidate every cached bank read
+        *(f"DROP TRIGGER IF EXISTS papers_{event.lower()}_version" for event in ("INSERT", "UPDATE", "DELETE")),
+        *(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS papers_{event.lower()}_version AFTER {event} ON papers
+            WHEN {when} BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = '{BANK}';
+            END
+            """
+            for event, when in (
+                ("INSERT", f"NEW.type IS NOT '{GENERATED_TYPE}'"),
+                ("UPDATE", f"NEW.type IS NOT '{GENERATED_TYPE}' OR OLD.type IS NOT '{GENERATED_TYPE}'"),
+                ("DELETE", f"OLD.type IS NOT '{GENERATED_TYPE}'"),
+            )
+        ),
+    ]),
+    (18, "submit key of each attempt", [
+        # attempts.Attempt.id (hex uuid): a submit retried after a writer timeout saves nothing twice.
+        # NULL for attempts recorded before it
+        "ALTER TABLE attempts ADD COLUMN uuid TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_attempts_uuid ON attempts(uuid)",
+    ]),
+    (19, "answer key and pinned options of each attempt as submitted", [
+        # Both aligned with the sheet: the review grades and lays out an attempt as it was taken,
+        # whatever later edits do to the bank. NULL for attempts recorded before them
+        "ALTER TABLE attempts ADD COLUMN answer_key BLOB",  # one byte per question: 'A'..'D' or '-'
+        "ALTER TABLE attempts ADD COLUMN pinned BLOB",      # one byte per question: 1 = A-D order kept
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_file=MASTER_DB, verbose=False):
+    """Bring db_file up to SCHEMA_VERSION; returns the list of applied versions"""
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    register_functions(conn)
+    applied = []
+    try:
+        current = get_version(conn)
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-check under the write lock in case another process migrated first
+                if get_version(conn) >= version:
+                    conn.execute("COMMIT")
+                    continue
+                for sql in statements:
+                    conn.execute(sql)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+            if verbose:
+                print(f"⬆  {db_file}: applied migration {version} ({description})")
+        if applied:
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return applied
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a question DB to the current schema version")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    args = parser.parse_args()
+
+    applied = migrate(args.db_file, verbose=True)
+    print(f"✅ {args.db_file} is at schema version {SCHEMA_VERSION}"
+          + ("" if applied else " (nothing to do)"))
@@ -0,0 +1,58 @@
+# db/progress.py
+import json
+
+
+def refresh_user_summary(cursor, user_id):
+    """Rebuild one user's dashboard summary from user_progress (call inside the submit transaction)"""
+    cursor.execute("""
+        INSERT INTO user_summary (user_id, progress, mocks_completed)
+        SELECT ?,
+               IFNULL(json_group_object(up.paper_id, json_array(up.answered_count, up.score, up.completed)), '{}'),
+               IFNULL(SUM(p.type = 'mock' AND up.completed = 1), 0)
+        FROM user_progress up
+        JOIN papers p ON p.paper_id = up.paper_id
+        WHERE up.user_id = ?
+        ON CONFLICT(user_id) DO UPDATE SET
+            progress = excluded.progress,
+            mocks_completed = excluded.mocks_completed
+    """, (user_id, user_id))
+
+
+def record_submission(cursor, user_id, paper_id, score, answers, completed=1):
+    """All writes for one submitted attempt ({question_id: selected letter}); the caller owns the transaction.
+
+    A completed submission replaces the paper's progress row and the user's
+    latest answers. An incomplete one (timed out) only replaces another
+    incomplete row with a strictly higher score, and leaves user_answers
+    alone: it never undoes a completed paper, a better or equal result or
+    the answers calibration reads.
+    """
+    cursor.execute("""
+        INSERT INTO user_progress (user_id, paper_id, answered_count, score, completed)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, paper_id)
+        DO UPDATE SET answered_count = excluded.answered_count,
+                      score = excluded.score,
+                      completed = excluded.completed
+        WHERE excluded.completed = 1
+           OR (IFNULL(user_progress.completed, 0) = 0 AND excluded.score > IFNULL(user_progress.score, 0))
+    """, (user_id, paper_id, len(answers), score, completed))
+
+    if completed:
+        cursor.executemany("""
+            INSERT OR REPLACE INTO user_answers (user_id, question_id, selected_option)
+            VALUES (?, ?, ?)
+        """, [
+            (user_id, q_id, selected)
+            for q_id, selected in answers.items()
+        ])
+
+    refresh_user_summary(cursor, user_id)
+
+
+def parse_summary(row):
+    """(progress dict {paper_id: (answered, score, completed)}, mocks_completed) from a user_summary row"""
+    if not row:
+        return {}, 0
+    progress = {int(pid): tuple(v) for pid, v in json.loads(row[0]).items()}
+    return progress, row[1]
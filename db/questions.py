@@ -0,0 +1,16 @@
+# db/questions.py
+import hashlib
+
+# SQL condition for questions that are still in the bank (as `q`); retired rows stay for history
+LIVE = "q.retired_at IS NULL"
+
+
+def question_hash(text):
+    """Hash of the question text ignoring case and whitespace differences"""
+    normalized = " ".join((text or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def register_functions(conn):
+    """Make qhash(text) available to SQL on conn (loaders, merges and migrations)"""
+    conn.create_function("qhash", 1, question_hash, deterministic=True)
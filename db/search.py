@@ -0,0 +1,105 @@
+# db/search.py
+import re
+
+from db.sqlite_connection import query
+
+MASTER_DB = "master_questions.db"
+INDEXED_COLUMNS = ("question", "option_a", "option_b", "option_c", "option_d", "explanation")
+# bm25 weight per indexed column: a hit in the question text counts most, the explanation least
+RANK = "bm25(10.0, 2.0, 2.0, 2.0, 2.0, 1.0)"
+
+_columns = ", ".join(INDEXED_COLUMNS)
+_new = ", ".join(f"new.{c}" for c in INDEXED_COLUMNS)
+_old = ", ".join(f"old.{c}" for c in INDEXED_COLUMNS)
+_changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in INDEXED_COLUMNS)
+
+# Applied to the master DB as migration 13: change it with a new migration, not in place.
+# External-content FTS5 index over questions: the text is stored once, in questions.
+# The triggers keep it in sync row by row for every writer (loaders, merges, edits);
+# updates that leave the indexed text alone do not touch the index.
+SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        {_columns},
+        content='questions', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE ON questions
+    WHEN {_changed} BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO questions_fts (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"INSERT INTO questions_fts (questions_fts, rank) VALUES ('rank', '{RANK}')",
+]
+REBUILD = "INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')"
+OPTIMIZE = "INSERT INTO questions_fts (questions_fts) VALUES ('optimize')"
+
+
+def ensure_index(conn):
+    """Create and fill the index on a DB outside the migrations (e.g. a loader's source DB)"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'").fetchone()
+    for sql in SCHEMA:
+        conn.execute(sql)
+    if not exists:
+        conn.execute(REBUILD)
+
+
+# ==== QUERIES ====
+_TOKENS = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def match_expression(text):
+    """Free text -> FTS5 query: every word (or "quoted phrase") must match; the last word is a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation typed by the user are
+    taken literally instead of raising a syntax error.
+    """
+    terms = []
+    for phrase, word in _TOKENS.findall(text or ""):
+        token = (phrase or word).replace('"', "")
+        if token.strip():
+            terms.append((f'"{token}"', bool(word)))
+    if not terms:
+        return None
+    last, is_word = terms[-1]
+    if is_word:
+        terms[-1] = (last + "*", is_word)
+    return " ".join(t for t, _ in terms)
+
+
+def count_matches(db_file, expression):
+    # Retired questions stay in the index (their rows are kept): filtered out by the join
+    return query("""
+        SELECT COUNT(*)
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH ? AND q.retired_at IS NULL
+    """, (expression,), db_file=db_file, one=True, label="search.count")[0]
+
+
+def search_questions(db_file, expression, limit=10, offset=0):
+    """One page of matches, best first:
+    (id, paper_id, topic, highlighted question, explanation snippet)"""
+    return query("""
+        SELECT q.id, q.paper_id, q.topic,
+               highlight(questions_fts, 0, '**', '**'),
+               snippet(questions_fts, 5, '**', '**', ' … ', 16)
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH ? AND q.retired_at IS NULL
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """, (expression, limit, offset), db_file=db_file, label="search.page")
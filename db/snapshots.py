@@ -0,0 +1,152 @@
+# db/snapshots.py
+import os
+import marshal
+import sqlite3
+import argparse
+import threading
+from typing import NamedTuple
+
+from db.cache import LRUCache, PAPER_CACHE_SIZE, BANK, data_versions
+from db.questions import LIVE
+from db.sqlite_connection import get_connection
+
+MASTER_DB = "master_questions.db"
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FORMAT = 1
+GENERATED_TYPE = "generated"  # papers drawn from the whole bank by papergen.py
+
+# SQL condition selecting a paper's live questions as `q` (one parameter: paper_id).
+# Generated papers do not own question rows: they list them in generated_paper_questions.
+PAPER_SCOPE = f"q.paper_id = ? AND {LIVE}"
+GENERATED_SCOPE = f"q.id IN (SELECT question_id FROM generated_paper_questions WHERE paper_id = ?) AND {LIVE}"
+
+
+class Paper(NamedTuple):
+    paper_id: int
+    title: str
+    type: str
+    instructions: str
+    # (id, question, option_a, option_b, option_c, option_d, correct_option, explanation)
+    questions: tuple
+    # One letter per question ("" where the key is missing), aligned with questions
+    answer_key: tuple
+
+
+paper_cache = LRUCache(PAPER_CACHE_SIZE)
+_lock = threading.Lock()
+# Generated papers never change once written (papergen.py): cached by id alone, no stat or version read
+IMMUTABLE = ("immutable",)
+_immutable = set()  # paper_cache keys of generated papers
+
+
+def snapshot_path(paper_id, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"paper_{paper_id}.snap")
+
+
+def scope_sql(paper_type):
+    return GENERATED_SCOPE if paper_type == GENERATED_TYPE else PAPER_SCOPE
+
+
+# ==== COMPILE (publish time) ====
+def compile_paper(conn, paper_id):
+    row = conn.execute("""
+        SELECT paper_id, title, type, instructions FROM papers WHERE paper_id = ?
+    """, (paper_id,)).fetchone()
+    if not row:
+        raise KeyError(f"Paper {paper_id} not found")
+
+    questions = tuple(conn.execute(f"""
+        SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation
+        FROM questions q
+        WHERE {scope_sql(row[2])}
+        ORDER BY id
+    """, (paper_id,)).fetchall())
+    answer_key = tuple(q[6] or "" for q in questions)
+    return Paper(*row, questions, answer_key)
+
+
+def write_snapshot(paper, snapshot_dir=SNAPSHOT_DIR):
+    """Atomically write a paper snapshot (marshal: compact, no code execution on load)"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(paper.paper_id, snapshot_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        marshal.dump((SNAPSHOT_FORMAT, tuple(paper)), f)
+    os.replace(tmp, path)
+    return path
+
+
+def publish_papers(db_file=MASTER_DB, paper_ids=None, snapshot_dir=SNAPSHOT_DIR):
+    """Compile snapshots for paper_ids (all papers when None); returns the written paths"""
+    conn = sqlite3.connect(db_file)
+    try:
+        if paper_ids is None:
+            paper_ids = [r[0] for r in conn.execute("SELECT paper_id FROM papers ORDER BY paper_id")]
+        return [write_snapshot(compile_paper(conn, pid), snapshot_dir) for pid in paper_ids]
+    finally:
+        conn.close()
+
+
+# ==== LOAD (app side) ====
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        fmt, fields = marshal.loads(f.read())
+    if fmt != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {fmt} in {path}")
+    return Paper(*fields)
+
+
+def load_paper(paper_id, db_file=MASTER_DB, snapshot_dir=SNAPSHOT_DIR):
+    """Return the shared, immutable Paper for paper_id.
+
+    Loaded from its snapshot with a single read and kept in a bounded
+    process-wide cache; re-read when the snapshot is republished. Without a
+    snapshot it is compiled from the DB and recompiled when the bank changes.
+    Generated papers are compiled once and then served by id alone.
+    """
+    key = (paper_id, db_file, snapshot_dir)
+    path = snapshot_path(paper_id, snapshot_dir)
+    if key in _immutable:
+        signature = IMMUTABLE
+    else:
+        try:
+            signature = ("snap", os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            signature = ("db", data_versions(db_file, (BANK,)))
+
+    hit, paper = paper_cache.get(key, signature)
+    if hit:
+        return paper
+
+    with _lock:
+        # Another thread may have loaded it while we waited
+        hit, paper = paper_cache.get(key, signature)
+        if hit:
+            return paper
+
+        paper = None
+        if signature[0] == "snap":
+            try:
+                paper = read_snapshot(path)
+            except (OSError, EOFError, ValueError, TypeError):
+                paper = None
+        if paper is None:
+            paper = compile_paper(get_connection(db_file, readonly=True), paper_id)
+
+        if paper.type == GENERATED_TYPE:
+            signature = IMMUTABLE
+            _immutable.add(key)
+        paper_cache.put(key, signature, paper)
+        return paper
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile immutable paper snapshots from the master DB")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--paper", type=int, action="append", help="Only these paper ids")
+    args = parser.parse_args()
+
+    paths = publish_papers(args.db_file, args.paper, args.out)
+    print(f"✅ Wrote {len(paths)} paper snapshot(s) to {args.out}/")
@@ -0,0 +1,110 @@
+# db/sqlite_connection.py
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+MASTER_DB = "master_questions.db"
+
+# Tunables (env overrides)
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+USE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+
+_local = threading.local()
+
+_stats = {}  # label -> [count, total_s, max_s]
+_stats_lock = threading.Lock()
+
+
+# ==== CONNECTIONS ====
+def _open(db_file, readonly):
+    if readonly:
+        # Plain read-only, never immutable=1: the app writes to this file (WAL commits and
+        # checkpoints) all the time, and an immutable reader would not see those changes
+        uri = f"file:{os.path.abspath(db_file)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+    else:
+        conn = sqlite3.connect(db_file, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        if USE_WAL:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return conn
+
+
+def get_connection(db_file=MASTER_DB, readonly=False):
+    """Reusable connection for the calling thread (autocommit; use transaction() to write)"""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    key = (db_file, readonly)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = _open(db_file, readonly)
+    return conn
+
+
+# ==== TIMINGS ====
+def _record(label, elapsed):
+    with _stats_lock:
+        s = _stats.get(label)
+        if s is None:
+            _stats[label] = [1, elapsed, elapsed]
+        else:
+            s[0] += 1
+            s[1] += elapsed
+            s[2] = max(s[2], elapsed)
+
+
+def _label(sql, label):
+    return label or " ".join(sql.split())[:60]
+
+
+def timings():
+    """Per-query stats: {label: {"count", "total_ms", "avg_ms", "max_ms"}}"""
+    with _stats_lock:
+        return {
+            label: {"count": c, "total_ms": t * 1000, "avg_ms": t * 1000 / c, "max_ms": m * 1000}
+            for label, (c, t, m) in _stats.items()
+        }
+
+
+def reset_timings():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ==== HELPERS ====
+def query(sql, params=(), db_file=MASTER_DB, readonly=True, one=False, label=None):
+    """Run a read query on this thread's connection and return fetchall() / fetchone()"""
+    conn = get_connection(db_file, readonly=readonly)
+    started = time.perf_counter()
+    try:
+        cur = conn.execute(sql, params)
+        return cur.fetchone() if one else cur.fetchall()
+    finally:
+        _record(_label(sql, label), time.perf_counter() - started)
+
+
+@contextmanager
+def transaction(db_file=MASTER_DB, label="transaction"):
+    """Write transaction on this thread's read-write connection: commit on success, roll back on error"""
+    conn = get_connection(db_file)
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        _record(label, time.perf_counter() - started)
@@ -0,0 +1,54 @@
+# db/stats.py
+import json
+
+# One row per question in the attempt: (question_id, answered, correct, a, b, c, d, seconds)
+QUESTION_SQL = """
+    INSERT INTO question_stats
+        (question_id, attempts, answered, correct, pick_a, pick_b, pick_c, pick_d, seconds)
+    VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(question_id) DO UPDATE SET
+        attempts = attempts + 1,
+        answered = answered + excluded.answered,
+        correct = correct + excluded.correct,
+        pick_a = pick_a + excluded.pick_a,
+        pick_b = pick_b + excluded.pick_b,
+        pick_c = pick_c + excluded.pick_c,
+        pick_d = pick_d + excluded.pick_d,
+        seconds = seconds + excluded.seconds
+"""
+
+# Same deltas rolled up by topic; the topic comes from an index lookup per question
+TOPIC_SQL = """
+    INSERT INTO topic_stats (topic, attempts, answered, correct, seconds)
+    SELECT q.topic, COUNT(*), SUM(json_extract(d.value, '$[1]')), SUM(json_extract(d.value, '$[2]')),
+           SUM(json_extract(d.value, '$[3]'))
+    FROM json_each(?) d
+    JOIN questions q ON q.id = json_extract(d.value, '$[0]')
+    WHERE q.topic IS NOT NULL AND q.topic != ''
+    GROUP BY q.topic
+    ON CONFLICT(topic) DO UPDATE SET
+        attempts = attempts + excluded.attempts,
+        answered = answered + excluded.answered,
+        correct = correct + excluded.correct,
+        seconds = seconds + excluded.seconds
+"""
+
+
+def record_stats(cursor, question_ids, selections, answer_key, seconds):
+    """Add one submitted attempt to the running counters (call inside the submit transaction).
+
+    selections: ord(letter) or 0 per question; answer_key: letters; seconds: per question.
+    Cost is O(questions in the attempt), whatever the size of the history.
+    """
+    rows = []
+    for q_id, code, key, secs in zip(question_ids, selections, answer_key, seconds):
+        picked = chr(code) if code else ""
+        rows.append((q_id, int(bool(code)), int(bool(code) and picked == key),
+                     int(picked == "A"), int(picked == "B"), int(picked == "C"), int(picked == "D"),
+                     float(secs)))
+    cursor.executemany(QUESTION_SQL, rows)
+    cursor.execute(TOPIC_SQL, (json.dumps([(r[0], r[1], r[2], r[7]) for r in rows]),))
+
+
+def percent_correct(attempts, correct):
+    return round(100 * correct / attempts) if attempts else None
@@ -0,0 +1,176 @@
+# db/writer.py
+import os
+import time
+import queue
+import sqlite3
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+from db.sqlite_connection import get_connection, _record
+
+MASTER_DB = "master_questions.db"
+
+# Tunables (env overrides)
+WRITER_BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", "500"))    # max jobs per commit
+WRITER_LINGER_MS = float(os.getenv("WRITER_LINGER_MS", "5"))      # wait this long to fill a group
+WRITER_RETRIES = int(os.getenv("WRITER_RETRIES", "3"))            # for a locked / busy DB
+WRITER_TIMEOUT = float(os.getenv("WRITER_TIMEOUT", "30"))         # default wait for an ack
+
+
+class WriteQueue:
+    """The only thread that writes to one SQLite file in this process.
+
+    Jobs are fn(cursor, *args). Whatever is queued while a commit runs (plus
+    WRITER_LINGER_MS) becomes one group: a single BEGIN IMMEDIATE ... COMMIT,
+    each job in its own savepoint, so a failing job fails only its own future.
+    Script threads never touch the write lock, so concurrent submits queue up
+    here instead of failing with "database is locked".
+    """
+
+    def __init__(self, db_file, batch_size=WRITER_BATCH_SIZE, linger_ms=WRITER_LINGER_MS):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)  # recent commit times (s)
+        self._counts = {"jobs": 0, "failed": 0, "commits": 0, "max_group": 0}
+
+    def submit(self, fn, *args, label=None):
+        """Queue fn(cursor, *args) for the writer thread; the Future resolves to its return value after COMMIT"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((fn, args, label or getattr(fn, "__name__", "job"), future, time.perf_counter()))
+        return future
+
+    def execute(self, sql, params=(), label=None):
+        return self.submit(_execute, sql, params, label=label)
+
+    def flush(self, timeout=WRITER_TIMEOUT):
+        """Block until everything queued so far is committed; False on timeout"""
+        try:
+            self.submit(_noop, label="flush").result(timeout)
+            return True
+        except Exception:
+            return False
+
+    # ==== WRITER THREAD ====
+    def _next_group(self):
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(group) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _commit(self, conn, group):
+        # Returns one (result, exception-or-None) per job; raises if the group itself cannot commit
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            outcomes = []
+            for fn, args, _, _, _ in group:
+                cursor.execute("SAVEPOINT job")
+                try:
+                    result = fn(cursor, *args)
+                    cursor.execute("RELEASE job")
+                    outcomes.append((result, None))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                    outcomes.append((None, e))
+            conn.execute("COMMIT")
+            return outcomes
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _run(self):
+        conn = get_connection(self.db_file)
+        while True:
+            group = self._next_group()
+            started = time.perf_counter()
+            for tries in range(1, WRITER_RETRIES + 1):
+                try:
+                    outcomes = self._commit(conn, group)
+                    break
+                except sqlite3.OperationalError as e:
+                    if tries == WRITER_RETRIES:
+                        outcomes = [(None, e)] * len(group)
+                        traceback.print_exc()
+                        break
+                    time.sleep(0.05 * tries)
+                except Exception as e:
+                    outcomes = [(None, e)] * len(group)
+                    traceback.print_exc()
+                    break
+            committed = time.perf_counter()
+
+            with self._lock:
+                self._latencies.append(committed - started)
+                self._counts["commits"] += 1
+                self._counts["jobs"] += len(group)
+                self._counts["failed"] += sum(e is not None for _, e in outcomes)
+                self._counts["max_group"] = max(self._counts["max_group"], len(group))
+            for (fn, args, label, future, queued), (result, error) in zip(group, outcomes):
+                # Per-job time from enqueue to durable, alongside the read timings
+                _record(f"writer.{label}", committed - queued)
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    def stats(self):
+        """Queue depth and commit latency, for the debug panel / logs"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+        stats = {"queue_depth": self._queue.qsize(), **counts}
+        if latencies:
+            stats.update({
+                "avg_group": counts["jobs"] / counts["commits"],
+                "commit_avg_ms": sum(latencies) * 1000 / len(latencies),
+                "commit_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+                "commit_max_ms": latencies[-1] * 1000,
+            })
+        return stats
+
+
+def _execute(cursor, sql, params):
+    cursor.execute(sql, params)
+
+
+def _noop(cursor):
+    pass
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_file=MASTER_DB):
+    writer = _writers.get(db_file)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.setdefault(db_file, WriteQueue(db_file))
+    return writer
+
+
+def write(fn, *args, db_file=MASTER_DB, label=None, timeout=WRITER_TIMEOUT):
+    """Run fn(cursor, *args) on the writer thread, wait for the commit and return fn's result"""
+    return get_writer(db_file).submit(fn, *args, label=label).result(timeout)
+
+
+def writer_stats():
+    return {db_file: writer.stats() for db_file, writer in list(_writers.items())}
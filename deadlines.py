@@ -0,0 +1,68 @@
+# deadlines.py
+import time
+import heapq
+import itertools
+import threading
+import traceback
+
+
+class DeadlineScheduler:
+    """One daemon thread that runs callbacks at wall-clock deadlines.
+
+    Nothing polls: the thread sleeps until the earliest deadline (or until a
+    new, earlier one is scheduled), so idle exams cost no reruns or CPU.
+    """
+
+    def __init__(self):
+        self._heap = []      # (deadline, seq, key)
+        self._entries = {}   # key -> (deadline, seq, callback)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, deadline, callback):
+        """Run callback() at time.time() >= deadline; replaces any earlier schedule for key"""
+        with self._cond:
+            seq = next(self._seq)
+            self._entries[key] = (deadline, seq, callback)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            self._entries.pop(key, None)
+
+    def pending(self):
+        with self._cond:
+            return len(self._entries)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, seq, key = self._heap[0]
+                    entry = self._entries.get(key)
+                    if entry is None or entry[1] != seq:
+                        heapq.heappop(self._heap)  # cancelled or rescheduled
+                        continue
+                    delay = deadline - time.time()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    del self._entries[key]
+                    callback = entry[2]
+                    break
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()
+
+
+scheduler = DeadlineScheduler()
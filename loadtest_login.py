@@ -0,0 +1,93 @@
+import time
+import argparse
+import threading
+
+from db import db_connection
+from db.db_connection import get_db_connection, hash_password, verify_password
+
+# Point DB_HOST/DB_NAME/DB_USER/DB_PASS at a LOCAL Postgres and set DB_SSLMODE=disable, e.g.
+#   docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16
+#   DB_HOST=localhost DB_NAME=postgres DB_USER=postgres DB_PASS=postgres DB_SSLMODE=disable \
+#       python loadtest_login.py --threads 20 --seconds 10
+
+# ==== CONFIG ====
+APP_SLUG = "loadtest"
+USERNAME = "loadtest@example.com"
+PASSWORD = "loadtest-password"
+
+
+def setup():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT NOT NULL,
+                    app_slug TEXT NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    valid_until DATE NOT NULL,
+                    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+                    PRIMARY KEY (username, app_slug)
+                )
+            """)
+            cur.execute("""
+                INSERT INTO users (username, app_slug, password_hash, valid_until, is_active)
+                VALUES (%s, %s, %s, CURRENT_DATE + 365, TRUE)
+                ON CONFLICT (username, app_slug) DO NOTHING
+            """, (USERNAME, APP_SLUG, hash_password(PASSWORD)))
+        conn.commit()
+
+
+def login(check_password):
+    # Same statement as pages/1_Login.py
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                    SELECT password_hash, valid_until, is_active
+                    FROM users
+                    WHERE username = %s AND app_slug = %s
+                """, (USERNAME, APP_SLUG))
+            row = cur.fetchone()
+    if check_password:
+        assert verify_password(PASSWORD, row[0])
+    return row
+
+
+def run(threads, seconds, check_password):
+    stop = time.monotonic() + seconds
+    counts = [0] * threads
+    errors = [0] * threads
+
+    def worker(i):
+        while time.monotonic() < stop:
+            try:
+                login(check_password)
+                counts[i] += 1
+            except Exception:
+                errors[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.monotonic() - started
+    return sum(counts) / elapsed, sum(errors)
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Logins/sec against local Postgres, without and with pooling")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--bcrypt", action="store_true", help="Include bcrypt.checkpw in each login")
+    args = parser.parse_args()
+
+    setup()
+
+    for label, pooled in (("before (connect per login)", False), ("after (pooled)", True)):
+        db_connection.POOL_ENABLED = pooled
+        rate, errors = run(args.threads, args.seconds, args.bcrypt)
+        print(f"{label:<28} {rate:>9,.1f} logins/s  errors={errors}")
+
+    print(f"pool: {db_connection.get_pool().stats()}")
@@ -1,6 +1,7 @@
 # pages/1_Login.py
 import streamlit as st
-from db.db_connection import get_db_connection, verify_password
+from db.db_connection import get_db_connection, check_password
+import auth
 import menu
 import os
 from datetime import datetime
@@ -40,10 +41,8 @@ if login_btn:
                     st.error("❌ Account is inactive")
                 elif valid_until < datetime.now().date():
                     st.error("❌ Subscription expired on " + str(valid_until))
-                elif verify_password(password, password_hash):
-                    st.session_state.logged_in = True
-                    st.session_state.user_name = username
-                    st.session_state.user_id = username  # or fetch ID
+                elif check_password(password, password_hash):
+                    auth.start_session(username, valid_until)
                     st.session_state.current_page = "1_Login.py"
                     st.success("✅ Logged in!")
                     st.switch_page("pages/2_Dashboard.py")
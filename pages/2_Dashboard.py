@@ -1,47 +1,86 @@
 import streamlit as st
-import sqlite3
 import menu
+import auth
 import os
+from db.cache import cached_query, RESULTS
+from db.sqlite_connection import query
+from db.progress import parse_summary
+from db.stats import percent_correct
+from papergen import create_paper, PAPER_SIZE
 
 DB_FILE = "master_questions.db"
+PAGE_SIZE = 10  # paper cards per section page
+
+@cached_query(DB_FILE)
+def get_catalogue():
+    # Same for every user: one process-wide copy
+    return query("""
+        SELECT paper_id, title, type, instructions, total_questions
+        FROM papers
+        ORDER BY type, paper_id
+    """, db_file=DB_FILE, label="dashboard.catalogue")
+
+def get_user_summary(user_id):
+    # The only per-user read: a primary-key lookup on the summary kept by save_user_progress
+    return parse_summary(query("""
+        SELECT progress, mocks_completed FROM user_summary WHERE user_id = ?
+    """, (user_id,), db_file=DB_FILE, one=True, label="dashboard.user_summary"))
+
+@cached_query(DB_FILE, depends=(RESULTS,))
+def get_topic_stats():
+    # One row per topic, kept current on submit: cost does not grow with attempts
+    return query("""
+        SELECT topic, attempts, answered, correct, seconds FROM topic_stats
+    """, db_file=DB_FILE, label="dashboard.topic_stats")
 
 def get_papers_with_progress(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            p.paper_id, p.title, p.type, p.instructions, p.total_questions,
-            IFNULL(up.answered_count, 0), IFNULL(up.score, 0), IFNULL(up.completed, 0)
-        FROM papers p
-        LEFT JOIN user_progress up
-        ON p.paper_id = up.paper_id AND up.user_id = ?
-        ORDER BY p.type, p.paper_id
-    """, (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
-
-def all_mocks_completed(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM papers p
-        LEFT JOIN user_progress up
-        ON p.paper_id = up.paper_id AND up.user_id = ?
-        WHERE p.type = 'mock' AND IFNULL(up.completed, 0) = 1
-    """, (user_id,))
-    completed_mocks = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM papers WHERE type = 'mock'")
-    total_mocks = cursor.fetchone()[0]
-    conn.close()
-    return completed_mocks == total_mocks and total_mocks > 0
-
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
-    st.switch_page("pages/1_Login.py")
+    progress, mocks_completed = get_user_summary(user_id)
+    papers = [
+        (pid, title, ptype, inst, total_q, *progress.get(pid, (0, 0, 0)))
+        for pid, title, ptype, inst, total_q in get_catalogue()
+    ]
+    total_mocks = sum(1 for p in papers if p[2] == "mock")
+    mocks_done = mocks_completed == total_mocks and total_mocks > 0
+    return papers, mocks_done
+
+def render_papers(papers, key, mode, locked=False):
+    pages = max(1, -(-len(papers) // PAGE_SIZE))
+    page_key = f"{key}_page"
+    page = min(st.session_state.get(page_key, 0), pages - 1)
+    start = page * PAGE_SIZE
+
+    cols = st.columns(2)
+    for idx, paper in enumerate(papers[start:start + PAGE_SIZE], start=start):
+        with cols[idx % 2]:
+            pid, title, ptype, inst, total_q, ans_count, score, completed = paper
+            completion_pct = int((ans_count / total_q) * 100) if total_q > 0 else 0
+            st.markdown(f"### {title.capitalize()}-{idx+1}")
+            st.progress(completion_pct / 100)
+            st.caption(f"**{total_q} Questions** — {completion_pct}% Completed")
+            with st.expander("📖 Instructions"):
+                st.write(inst or "No instructions provided.")
+            if locked:
+                st.button("🔒 Locked", key=f"locked_{pid}", disabled=True)
+            elif st.button("▶ Start Test", key=f"start_{pid}"):
+                st.session_state.selected_paper = pid
+                st.session_state.mode = mode
+                st.switch_page("pages/3_Test.py")
+
+    if pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        if prev_col.button("⬅ Prev", key=f"{key}_prev", disabled=page == 0):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+        info_col.caption(f"Page {page + 1} of {pages}")
+        if next_col.button("Next ➡", key=f"{key}_next", disabled=page >= pages - 1):
+            st.session_state[page_key] = page + 1
+            st.rerun()
 
 st.set_page_config(page_title="Dashboard", layout="wide")
+
+if not auth.restore_session():
+    st.switch_page("pages/1_Login.py")
+
 st.session_state.current_page = os.path.basename(__file__)
 menu.top_menu()
 
@@ -53,53 +92,45 @@ with col1:
 with col2:
     st.markdown("<div style='text-align: right; padding-top: 28px;'>", unsafe_allow_html=True)
     if st.button("🚪 Logout", key="logout_top"):
-        st.session_state.clear()
+        auth.end_session()
         st.switch_page("pages/1_Login.py")
     st.markdown("</div>", unsafe_allow_html=True)
 
 st.markdown("---")
 
-papers = get_papers_with_progress(st.session_state.user_id)
-mocks_done = all_mocks_completed(st.session_state.user_id)
+papers, mocks_done = get_papers_with_progress(st.session_state.user_id)
 
 mock_papers = [p for p in papers if p[2] == "mock"]
 practice_papers = [p for p in papers if p[2] == "practice"]
 
 # MOCK PAPERS
 st.subheader("📚 Mock Papers")
-cols = st.columns(2)
-for idx, paper in enumerate(mock_papers):
-    a=idx
-    with cols[idx % 2]:
-        pid, title, ptype, inst, total_q, ans_count, score, completed = paper
-        completion_pct = int((ans_count / total_q) * 100) if total_q > 0 else 0
-        st.markdown(f"### {title.capitalize()}-{a+1}")
-        st.progress(completion_pct / 100)
-        st.caption(f"**{total_q} Questions** — {completion_pct}% Completed")
-        with st.expander("📖 Instructions"):
-            st.write(inst or "No instructions provided.")
-        if st.button("▶ Start Test", key=f"start_{pid}"):
-            st.session_state.selected_paper = pid
-            st.session_state.mode = "Mock Exam"
-            st.switch_page("pages/3_Test.py")
+render_papers(mock_papers, "mock", "Mock Exam")
 
 # PRACTICE PAPERS
 st.subheader("🛠 Practice Papers")
-cols = st.columns(2)
-for idx, paper in enumerate(practice_papers):
-    b=idx
-    with cols[idx % 2]:
-        pid, title, ptype, inst, total_q, ans_count, score, completed = paper
-        completion_pct = int((ans_count / total_q) * 100) if total_q > 0 else 0
-        st.markdown(f"### {title.capitalize()}-{b+1}")
-        st.progress(completion_pct / 100)
-        st.caption(f"**{total_q} Questions** — {completion_pct}% Completed")
-        with st.expander("📖 Instructions"):
-            st.write(inst or "No instructions provided.")
-        if not mocks_done:
-            st.button("🔒 Locked", key=f"locked_{pid}", disabled=True)
-        else:
-            if st.button("▶ Start Test", key=f"start_{pid}"):
-                st.session_state.selected_paper = pid
-                st.session_state.mode = "Practice Mode"
-                st.switch_page("pages/3_Test.py")
+render_papers(practice_papers, "practice", "Practice Mode", locked=not mocks_done)
+
+# ADAPTIVE PRACTICE (questions drawn from the user's weakest topics)
+if st.button("🎯 Adaptive Practice", key="adaptive_practice"):
+    st.switch_page("pages/5_Practice.py")
+
+# GENERATED MOCK (stratified draw from the whole bank; the same seed gives the same paper)
+with st.expander("🎲 Generate a mock paper"):
+    seed = st.number_input("Seed (0 for a new random paper)", min_value=0, step=1, key="mock_seed")
+    if st.button(f"▶ Start a {PAPER_SIZE}-question mock", key="generate_mock"):
+        try:
+            st.session_state.selected_paper = create_paper(DB_FILE, PAPER_SIZE, int(seed) or None)
+        except Exception as e:
+            st.error(f"❌ Could not generate a paper: {e}")
+            st.stop()
+        st.session_state.mode = "Mock Exam"
+        st.switch_page("pages/3_Test.py")
+
+# TOPIC DIFFICULTY (all candidates)
+topic_stats = [t for t in get_topic_stats() if t[1]]
+if topic_stats:
+    with st.expander("📈 Topic difficulty across all candidates"):
+        for topic, attempts, answered, correct, seconds in sorted(topic_stats, key=lambda t: t[3] / t[1]):
+            st.caption(f"**{topic}** — {percent_correct(attempts, correct)}% correct"
+                       f" over {attempts} attempts · avg {seconds / attempts:.0f}s per question")
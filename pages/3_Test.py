@@ -1,18 +1,29 @@
 import streamlit as st
 import menu
-import sqlite3
+import auth
 import time
 import os
+import functools
+from db.snapshots import load_paper
+from attempts import (new_attempt, resume_attempt, recover_open_attempts, finalize_attempt, expired,
+                      save_answer, set_marked, clear_marks, set_position)
+from widgets.navigator import exam_navigator, PENDING, ANSWERED, MARKED
+from widgets.countdown import countdown
+from db.writer import writer_stats
+from db.sqlite_connection import timings, reset_timings
+from db.cache import query_cache
+from db.snapshots import paper_cache
+from shuffle import display_options, to_canonical, to_display
 
 DB_FILE = "master_questions.db"
+SCRIPT_STARTED = time.perf_counter()
 
 # ===== PAGE CONFIG =====
 st.set_page_config(page_title="NISM Test", layout="wide")
 st.session_state.current_page = os.path.basename(__file__)
-menu.top_menu()
 
 # ===== SESSION CHECKS =====
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if not auth.restore_session():
     if "selected_paper" in st.session_state:
         st.error("⚠ Session expired. Redirecting to login...")
         time.sleep(1)
@@ -21,6 +32,8 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
         st.switch_page("pages/1_Login.py")
     st.stop()
 
+menu.top_menu()
+
 required_keys = ["user_id", "selected_paper", "mode"]
 for key in required_keys:
     if key not in st.session_state:
@@ -34,108 +47,103 @@ PAPER_ID = st.session_state.selected_paper
 MODE = st.session_state.mode
 
 # ===== DB HELPERS =====
-def get_questions(paper_id):
+def get_paper(paper_id):
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation
-            FROM questions
-            WHERE paper_id = ?
-            ORDER BY id
-        """, (paper_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        # Shared immutable snapshot: one read per process, not one query per session
+        return load_paper(paper_id, DB_FILE)
     except Exception as e:
         st.error(f"❌ Database error: {e}")
         st.stop()
 
-def save_user_progress(user_id, paper_id, score, total_questions, answers, completed=1):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO user_progress (user_id, paper_id, answered_count, score, completed)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id, paper_id)
-            DO UPDATE SET answered_count = excluded.answered_count,
-                          score = excluded.score,
-                          completed = excluded.completed
-        """, (user_id, paper_id, len(answers), score, completed))
-
-        cursor.executemany("""
-            INSERT OR REPLACE INTO user_answers (user_id, question_id, selected_option)
-            VALUES (?, ?, ?)
-        """, [
-            (user_id, q_id, ans["selected"])
-            for q_id, ans in answers.items()
-        ])
-
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        st.error(f"❌ Failed to save progress: {e}")
-
 # ===== SESSION STATE INIT =====
-if "questions" not in st.session_state:
-    st.session_state.questions = get_questions(PAPER_ID)
-    st.rerun()
+exam_duration = 20 * 60
+EXPIRY_GRACE = 2.0  # seconds the browser's "time's up" may run ahead of the server
 
-if "answers" not in st.session_state:
-    st.session_state.answers = {}
+if "attempt" not in st.session_state:
+    paper = get_paper(PAPER_ID)
+    if not paper.questions:
+        st.error("❌ No questions found for this test.")
+        st.stop()
 
-if "marked" not in st.session_state:
-    st.session_state.marked = {}
+    # Server-side attempt: owns the deadline and is auto-submitted by the scheduler thread.
+    # After a reconnect or restart, pick up the journaled attempt instead of starting over.
+    recover_open_attempts(DB_FILE)
+    resumed = resume_attempt(USER_ID, paper, DB_FILE)
+    if resumed is not None:
+        st.session_state.current_q = resumed.current_q
+        st.toast("↩ Resumed your attempt where you left off", icon="💾")
+    st.session_state.attempt = resumed or new_attempt(USER_ID, paper, exam_duration, DB_FILE)
+
+# The attempt is the only per-session exam state: compact arrays over the shared paper
+attempt = st.session_state.attempt
+questions = attempt.questions
+n_questions = len(questions)
 
 if "current_q" not in st.session_state:
     st.session_state.current_q = 0
 
-if "start_time" not in st.session_state:
-    st.session_state.start_time = time.time()
-
 if "submitted" not in st.session_state:
     st.session_state.submitted = False
 
-questions = st.session_state.questions
-n_questions = len(questions)
-
-if n_questions == 0:
-    st.error("❌ No questions found for this test.")
-    st.stop()
+# The server clock decides when time is up, whatever the browser shows
+if attempt.submitted or expired(attempt):
+    st.session_state.submitted = True
 
 # ===== SYNC QUERY PARAMS =====
-current_q_idx = st.session_state.current_q
-
 if "q" in st.query_params:
     try:
         q_index = int(st.query_params["q"])
-        if 0 <= q_index < n_questions and st.session_state.current_q != q_index:
+        if 0 <= q_index < n_questions:
             st.session_state.current_q = q_index
-            st.rerun()
     except Exception:
         pass
 
-if st.query_params.get("q") != str(current_q_idx):
-    st.query_params["q"] = str(current_q_idx)
-
-# ===== TIMER =====
-exam_duration = 20 * 60
-time_left = max(0, exam_duration - (time.time() - st.session_state.start_time))
-mins, secs = divmod(int(time_left), 60)
-
-if time_left <= 0 and not st.session_state.submitted:
-    st.session_state.submitted = True
-    st.warning("⏰ Time's up! Submitting your test...")
-    time.sleep(1)
-    st.rerun()
-
-# ===== SIDEBAR NAVIGATION =====
-if MODE == "Mock Exam":
-    st.sidebar.header("📋 Question Navigator")
-
-    st.sidebar.markdown("""
+if st.query_params.get("q") != str(st.session_state.current_q):
+    st.query_params["q"] = str(st.session_state.current_q)
+
+# ===== TIMINGS (?debug=1 shows server time per full run / fragment run) =====
+def record_timing(name, started):
+    runs = st.session_state.setdefault("run_timings", {}).setdefault(name, [])
+    runs.append((time.perf_counter() - started) * 1000)
+    del runs[:-50]
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper():
+            started = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                record_timing(name, started)
+        return wrapper
+    return decorator
+
+# ===== HELPERS =====
+# selection byte -> navigator code, applied to the whole array at once
+NAV_CODES = bytes(ord(PENDING) if b == 0 else ord(ANSWERED) for b in range(256))
+
+def nav_states():
+    # One character per question: the whole navigator state in n bytes, in displayed order
+    states = attempt.selections.translate(NAV_CODES)
+    for i in attempt.marked_indexes():
+        states[i] = ord(MARKED)
+    return bytes(map(states.__getitem__, attempt.order)).decode("ascii")
+
+def go_to(q_idx):
+    st.session_state.current_q = q_idx
+    st.query_params["q"] = str(q_idx)
+    set_position(attempt, q_idx)
+
+def refresh():
+    # Navigator, status bar and question are one fragment: every click reruns just that
+    st.rerun(scope="fragment")
+
+# ===== NAVIGATION =====
+def navigator():
+    st.header("📋 Question Navigator")
+
+    st.markdown("""
     <small>
     ✅ = Saved  
     🔖 = Marked  
@@ -143,74 +151,59 @@ if MODE == "Mock Exam":
     </small>
     """, unsafe_allow_html=True)
 
-    show_marked_only = st.sidebar.checkbox("📌 Show Only Marked Questions")
-
-    question_indices = list(range(n_questions))
-    if show_marked_only:
-        question_indices = [
-            i for i in question_indices
-            if st.session_state.marked.get(questions[i][0], False)
-        ]
-
-    # Grid of navigator buttons
-    cols_per_row = 5
-    for i in range(0, len(question_indices), cols_per_row):
-        cols = st.sidebar.columns(cols_per_row, gap="small")
-        for j, q_idx in enumerate(question_indices[i:i + cols_per_row]):
-            q_id = questions[q_idx][0]
-
-            btn_label = "🔖" if st.session_state.marked.get(q_id, False) \
-                else "✅" if q_id in st.session_state.answers \
-                else str(q_idx + 1)
-
-            if cols[j].button(btn_label, key=f"nav_{q_idx}", help=f"Q{q_idx+1}"):
-                st.session_state.current_q = q_idx
-                st.query_params["q"] = str(q_idx)
-                st.rerun()
+    # Single client-side component instead of one st.button per question
+    clicked = exam_navigator(nav_states(), cols=5)
+    if clicked is not None and 0 <= clicked < n_questions:
+        go_to(clicked)
+        refresh()
 
     # ✅ Clear All Marks Button
-    def clear_all_marks():
-        st.session_state.marked.clear()
-
-    if st.sidebar.button("🧹 Clear All Marks", use_container_width=True):
-        clear_all_marks()
-        st.rerun()
-
-    st.sidebar.markdown("---")
-    if st.sidebar.button("✅ Submit Test", use_container_width=True):
-        if any(st.session_state.marked.values()):
-            st.sidebar.warning("⚠ Review marked questions.")
-        elif len(st.session_state.answers) < n_questions:
-            st.sidebar.warning("⚠ Answer all questions.")
+    if st.button("🧹 Clear All Marks", use_container_width=True):
+        clear_marks(attempt)
+        for key in [k for k in st.session_state if str(k).startswith("mark_")]:
+            del st.session_state[key]
+        refresh()
+
+    st.markdown("---")
+    if st.button("✅ Submit Test", use_container_width=True):
+        if attempt.marked_count():
+            st.warning("⚠ Review marked questions.")
+        elif attempt.answered_count() < n_questions:
+            st.warning("⚠ Answer all questions.")
         else:
             st.session_state.submitted = True
-            st.rerun()
-
-# ===== STATUS BAR =====
-answered_count = len(st.session_state.answers)
-marked_count = sum(1 for v in st.session_state.marked.values() if v)
-st.markdown(f"""
-**Mode:** {MODE} |
-**Q:** {current_q_idx+1}/{n_questions} |
-**Ans:** {answered_count} |
-**Marked:** {marked_count} |
-⏳ **Time:** {mins:02d}:{secs:02d}
-""")
-st.markdown("---")
-
-# ===== RENDER QUESTION =====
-if not st.session_state.submitted:
-    q_id, q_text, a, b, c, d, correct_opt, explanation = questions[current_q_idx]
-    options_map = {"A": a, "B": b, "C": c, "D": d}
+            st.rerun()  # full run: the submitted view replaces the page
+
+# ===== STATUS BAR + QUESTION =====
+def question_panel():
+    current_q_idx = st.session_state.current_q
+
+    # Status bar: everything in it changes with the actions below, so it reruns with them
+    answered_count = attempt.answered_count()
+    marked_count = attempt.marked_count()
+    st.markdown(f"""
+    **Mode:** {MODE} |
+    **Q:** {current_q_idx+1}/{n_questions} |
+    **Ans:** {answered_count} |
+    **Marked:** {marked_count}
+    """)
+    st.markdown("---")
+
+    # Displayed position -> question index and option permutation of this attempt
+    i = attempt.order[current_q_idx]
+    perm = attempt.perms[i]
+    q_id, q_text, a, b, c, d, _, _ = questions[i]
+    options_map = dict(display_options(perm, (a, b, c, d)))  # keyed by displayed letter
     opt_keys = [k for k, v in options_map.items() if v and str(v).strip()]
 
     if not opt_keys:
         st.error("❌ No valid options.")
-        st.stop()
+        return
 
     radio_key = f"sel_{q_id}"
-    if q_id in st.session_state.answers:
-        st.session_state[radio_key] = st.session_state.answers[q_id]["selected"]
+    saved = attempt.selected(i)
+    if saved:
+        st.session_state[radio_key] = to_display(perm, saved)
 
     st.subheader(f"Q{current_q_idx+1}. {q_text}")
     selected = st.radio(
@@ -225,75 +218,111 @@ if not st.session_state.submitted:
     with col1:
         if st.button("💾 Save Answer", key=f"save_{q_id}"):
             if selected:
-                st.session_state.answers[q_id] = {
-                    "selected": selected,
-                    "selected_text": options_map[selected],
-                    "correct": correct_opt,
-                    "correct_text": options_map.get(correct_opt, ""),
-                    "explanation": explanation
-                }
+                save_answer(attempt, i, to_canonical(perm, selected))
                 st.toast("✅ Answer saved!", icon="💾")
-                st.rerun()
+                refresh()
             else:
                 st.warning("⚠ Select an option first.")
 
     with col2:
         if st.button("💾 Save & Next", key=f"save_next_{q_id}"):
             if selected:
-                st.session_state.answers[q_id] = {
-                    "selected": selected,
-                    "selected_text": options_map[selected],
-                    "correct": correct_opt,
-                    "correct_text": options_map.get(correct_opt, ""),
-                    "explanation": explanation
-                }
+                save_answer(attempt, i, to_canonical(perm, selected))
                 if current_q_idx < n_questions - 1:
-                    st.session_state.current_q += 1
-                    st.query_params["q"] = str(st.session_state.current_q)
-                st.rerun()
+                    go_to(current_q_idx + 1)
+                refresh()
             else:
                 st.warning("⚠ Select an option first.")
 
     with col3:
         if st.button("⬅ Previous", key=f"prev_{q_id}") and current_q_idx > 0:
-            st.session_state.current_q -= 1
-            st.query_params["q"] = str(st.session_state.current_q)
-            st.rerun()
+            go_to(current_q_idx - 1)
+            refresh()
 
     with col4:
         if st.button("Next ➡", key=f"next_{q_id}") and current_q_idx < n_questions - 1:
-            st.session_state.current_q += 1
-            st.query_params["q"] = str(st.session_state.current_q)
-            st.rerun()
-
-    # ✅ Mark for Review (Fixed: No st.rerun() in callback)
-    def on_mark_change():
-        st.session_state.marked[q_id] = st.session_state[mark_key]
+            go_to(current_q_idx + 1)
+            refresh()
 
+    # ✅ Mark for Review
     mark_key = f"mark_{q_id}"
-    current_marked = st.session_state.marked.get(q_id, False)
+    current_marked = attempt.is_marked(i)
 
-    st.checkbox(
+    marked_now = st.checkbox(
         "🔖 Mark for Review",
         value=current_marked,
         key=mark_key,
-        on_change=on_mark_change
     )
+    if marked_now != current_marked:
+        set_marked(attempt, i, marked_now)
+        refresh()
+
+# ===== EXAM (fragment) =====
+@st.fragment
+@timed("exam_panel")
+def exam_panel():
+    if expired(attempt):
+        st.rerun()  # full run shows the submitted view; no answers after the deadline
+
+    # The badges change with saves and marks, so the navigator reruns with the question
+    # (nav_states is ~10 µs for 50 questions) instead of a full app run per click
+    if MODE == "Mock Exam":
+        nav_col, question_col = st.columns([1, 3])
+        with nav_col:
+            navigator()
+        with question_col:
+            question_panel()
+    else:
+        question_panel()
+
+# ===== PAGE =====
+if not st.session_state.submitted:
+    # Ticks in the browser; reports once at zero and the server re-checks the deadline.
+    # A browser slightly ahead of the server waits out the difference; an early report beyond
+    # EXPIRY_GRACE is ignored (the next run re-syncs the countdown)
+    if countdown(attempt.deadline):
+        left = attempt.deadline - time.time()
+        if left <= EXPIRY_GRACE:
+            time.sleep(max(0.0, left))
+            st.rerun()
+    exam_panel()
 
 # ===== AFTER SUBMISSION =====
 else:
+    if expired(attempt):
+        st.warning("⏰ Time's up! Your test was submitted automatically.")
+    try:
+        # No-op if the deadline scheduler already saved it; a timed-out attempt is not completed
+        if finalize_attempt(attempt, completed=not expired(attempt)):
+            st.toast("✅ Results saved!", icon="📈")
+    except Exception as e:
+        st.error(f"❌ Failed to save progress: {e}")
+        st.stop()
+
     st.markdown("## 📊 Test Submitted!")
-    score = sum(1 for q in questions if st.session_state.answers.get(q[0], {}).get("selected") == q[6])
+    score = attempt.score
     percentage = (score / n_questions) * 100
     st.markdown(f"### 🎯 Score: {score}/{n_questions} ({percentage:.1f}%)")
 
-    if "results_saved" not in st.session_state:
-        save_user_progress(USER_ID, PAPER_ID, score, n_questions, st.session_state.answers)
-        st.session_state.results_saved = True
-        st.toast("✅ Results saved!", icon="📈")
-
     # Cleanup
-    for key in ["questions", "answers", "marked", "current_q", "start_time", "submitted"]:
+    for key in ["current_q", "attempt", "submitted"]:
         st.session_state.pop(key, None)
 
-    st.link_button("📄 View Detailed Results", "pages/4_Result.py", type="primary")
\ No newline at end of file
+    st.link_button("📄 View Detailed Results", "pages/4_Result.py", type="primary")
+
+record_timing("full_run", SCRIPT_STARTED)
+if st.query_params.get("debug") == "1":
+    with st.expander("⏱ Server time per run (ms)"):
+        for name, runs in st.session_state.get("run_timings", {}).items():
+            st.caption(f"{name}: last {runs[-1]:.1f} · avg {sum(runs) / len(runs):.1f} over {len(runs)} runs")
+        for db_file, stats in writer_stats().items():
+            st.caption(f"writer {db_file}: " + " · ".join(
+                f"{k} {v:.1f}" if isinstance(v, float) else f"{k} {v}" for k, v in stats.items()))
+        for name, cache in (("query cache", query_cache), ("paper cache", paper_cache)):
+            st.caption(f"{name}: " + " · ".join(f"{k} {v}" for k, v in cache.stats().items()))
+        # Process-wide SQLite timings by query label, slowest in total first
+        st.dataframe([{"query": label, **{k: round(v, 2) for k, v in t.items()}}
+                      for label, t in sorted(timings().items(), key=lambda kv: -kv[1]["total_ms"])],
+                     hide_index=True, use_container_width=True)
+        if st.button("Reset query timings", key="reset_timings"):
+            reset_timings()
@@ -2,17 +2,23 @@
 
 import streamlit as st
 import menu
-import sqlite3
+import auth
+from datetime import datetime
+from db.cache import cached_query, BANK, RESULTS
+from db.sqlite_connection import query, get_connection
+from db.stats import percent_correct
+from db.history import load_attempt
+from shuffle import sheet_layout, pinned_options, positions, display_options, to_display
 
 DB_FILE = "master_questions.db"
 
 st.set_page_config(page_title="Test Results", layout="wide")
 st.session_state.current_page = "4_Result.py"
-menu.top_menu()
-
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if not auth.restore_session():
     st.switch_page("pages/1_Login.py")
 
+menu.top_menu()
+
 col1, col2 = st.columns([3, 1])  # Left (title) takes more space, right (logout) less
 
 with col1:
@@ -21,7 +27,7 @@ with col1:
 with col2:
     st.markdown("<div style='text-align: right; padding-top: 28px;'>", unsafe_allow_html=True)
     if st.button("🚪 Logout", key="logout_top"):
-        st.session_state.clear()
+        auth.end_session()
         st.switch_page("pages/1_Login.py")
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -37,67 +43,210 @@ if "selected_paper" not in st.session_state:
 PAPER_ID = st.session_state.selected_paper
 USER_ID = st.session_state.user_id
 
+PAGE_SIZE = 10  # questions per results page
+RELATED = 5     # related questions shown under a wrong answer
+FILTERS = {"All": "", "❌ Wrong only": "wrong", "⬜ Unanswered": "unanswered"}
+MISSING = (None, "", (None,) * 4)  # answer key entry of a question deleted from the bank
+
+# Row filters over (selected, correct) of one question of the sheet
+STATUS = {
+    "": lambda selected, correct: True,
+    "wrong": lambda selected, correct: selected is not None and selected != correct,
+    "unanswered": lambda selected, correct: selected is None,
+}
+
 # === Fetch Results ===
-def get_user_results(user_id, paper_id):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            q.id, q.question, q.option_a, q.option_b, q.option_c, q.option_d,
-            q.correct_option, q.explanation,
-            ua.selected_option
+# A result is one submitted attempt, reviewed from its own packed sheet: its questions, answers,
+# answer key and layout exactly as submitted. Question text and topics come from the bank (BANK),
+# candidate stats also from submitted attempts (RESULTS)
+@cached_query(DB_FILE, depends=(RESULTS,))
+def get_attempt_history(user_id, paper_id, limit=10):
+    # Summary columns only: the packed sheets stay on disk
+    return query("""
+        SELECT attempt_id, submitted_at, score, answered, length(sheet), seed
+        FROM attempts
+        WHERE user_id = ? AND paper_id = ?
+        ORDER BY attempt_id DESC
+        LIMIT ?
+    """, (user_id, paper_id, limit), db_file=DB_FILE, label="result.attempt_history")
+
+@cached_query(DB_FILE, depends=())
+def get_attempt(attempt_id):
+    # Attempts are never updated: cached by id alone
+    return load_attempt(get_connection(DB_FILE, readonly=True), attempt_id)
+
+@cached_query(DB_FILE)
+def get_answer_key(question_ids):
+    """{id: (correct, topic, (a, b, c, d))} for the questions of a sheet, retired ones included.
+    Grading and layout only fall back to it for attempts stored without their own key"""
+    marks = ",".join("?" * len(question_ids))
+    return {r[0]: (r[1], r[2], r[3:]) for r in query(f"""
+        SELECT q.id, q.correct_option, IFNULL(q.topic, ''), q.option_a, q.option_b, q.option_c, q.option_d
+        FROM questions q
+        WHERE q.id IN ({marks})
+    """, question_ids, db_file=DB_FILE, label="result.answer_key")}
+
+@cached_query(DB_FILE, depends=(BANK, RESULTS))
+def get_result_rows(question_ids):
+    """(id, question, a, b, c, d, attempts, correct_count, seconds)
+    for one page of questions; no explanations"""
+    marks = ",".join("?" * len(question_ids))
+    return query(f"""
+        SELECT q.id, q.question, q.option_a, q.option_b, q.option_c, q.option_d,
+               IFNULL(s.attempts, 0), IFNULL(s.correct, 0), IFNULL(s.seconds, 0)
         FROM questions q
-        LEFT JOIN user_answers ua ON q.id = ua.question_id AND ua.user_id = ?
-        WHERE q.paper_id = ?
+        LEFT JOIN question_stats s ON s.question_id = q.id
+        WHERE q.id IN ({marks})
         ORDER BY q.id
-    """, (user_id, paper_id))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    """, question_ids, db_file=DB_FILE, label="result.rows")
+
+@cached_query(DB_FILE)
+def get_explanation(question_id):
+    row = query("SELECT explanation FROM questions WHERE id = ?",
+                (question_id,), db_file=DB_FILE, one=True, label="result.explanation")
+    return row[0] if row else None
 
-results = get_user_results(USER_ID, PAPER_ID)
+@cached_query(DB_FILE)
+def get_related(question_id, limit=RELATED):
+    """(question, topic, paper title) of the nearest questions from other papers,
+    precomputed offline by similar_questions.py: one primary-key range read"""
+    return query("""
+        SELECT q.question, IFNULL(q.topic, ''), IFNULL(p.title, '')
+        FROM question_neighbours n
+        JOIN questions q ON q.id = n.neighbour_id
+        LEFT JOIN papers p ON p.paper_id = q.paper_id
+        WHERE n.question_id = ? AND q.retired_at IS NULL
+        ORDER BY n.rank
+        LIMIT ?
+    """, (question_id, limit), db_file=DB_FILE, label="result.related")
 
-if not results:
+history = get_attempt_history(USER_ID, PAPER_ID)
+if not history:
     st.error("❌ No answer data found.")
     if st.button("Back to Dashboard", type="secondary"):
         st.switch_page("pages/2_Dashboard.py")
     st.stop()
 
+# The latest attempt unless an earlier one is picked
+attempt_id = history[0][0]
+if len(history) > 1:
+    labels = {
+        row_id: f"{datetime.fromtimestamp(submitted_at).strftime('%d %b %Y %H:%M')} — "
+                f"{score}/{n_total} ({n_answered} answered)"
+        for row_id, submitted_at, score, n_answered, n_total, _ in history
+    }
+    attempt_id = st.selectbox(f"🕘 Attempt ({len(history)})", list(labels), format_func=labels.get,
+                              key="result_attempt")
+
+record = get_attempt(attempt_id)
+if record is None or record[0] != USER_ID:
+    st.error("❌ No answer data found.")
+    st.stop()
+_, _, _, _, seed, question_ids, answers, sheet_key, pinned = record
+answer_key = get_answer_key(question_ids)
+if sheet_key is None:  # attempts stored before their key and layout were: use the bank's
+    sheet_key = {q_id: key[0] for q_id, key in answer_key.items() if key[0]}
+    pinned = pinned_options(answer_key.get(q_id, MISSING)[2] for q_id in question_ids)
+
 # === Calculate Score ===
-total = len(results)
-correct = sum(1 for r in results if r[8] == r[6])
-percentage = (correct / total) * 100
+total = len(question_ids)
+answered = len(answers)
+correct = sum(1 for q_id, letter in answers.items() if letter == sheet_key.get(q_id))
+percentage = (correct / total) * 100 if total else 0.0
 
 st.title("📜 Your Test Results")
 st.markdown(f"### 🎯 Score: {correct}/{total} ({percentage:.1f}%)")
+st.caption(f"✅ {correct} correct · ❌ {answered - correct} wrong · ⬜ {total - answered} unanswered")
 st.markdown("---")
 
-# === Show Each Question ===
-option_cols = {"A": 2, "B": 3, "C": 4, "D": 5}
-
-for idx, row in enumerate(results):
-    q_id, question, a, b, c, d, correct, explanation, selected = row
-    status = "✅" if selected == correct else "❌"
-    bg_color = "lightgreen" if selected == correct else "lightpink" if selected else "lightgrey"
-
-    with st.expander(f"{status} Q{idx+1}: {question}", expanded=False):
-        st.markdown(f"**Your Answer:** `{selected or 'Not answered'}`")
-        st.markdown(f"**Correct Answer:** `{correct}`")
-
-        st.markdown("**Options:**")
-        for opt in "ABCD":
-            txt = row[option_cols[opt]]
-            if not txt:
-                continue
-            if opt == correct:
-                st.markdown(f"- **{opt}. {txt}** ✅")
-            elif opt == selected:
-                st.markdown(f"- ~~{opt}. {txt}~~ ❌")
-            else:
-                st.markdown(f"- {opt}. {txt}")
-
-        if explanation:
-            st.info(f"📘 **Explanation:**\n\n{explanation}")
+# Questions and options as this attempt showed them, re-derived from its seed and pinned options
+order, perms = sheet_layout(seed, pinned)
+shown_at = positions(order)
+slots = {q_id: (shown_at[i] + 1, perms[i]) for i, q_id in enumerate(question_ids)}  # id -> (number, perm)
+by_position = sorted(question_ids, key=lambda q_id: slots[q_id][0])
+
+# === Show Questions (one page at a time; reruns only this fragment) ===
+@st.fragment
+def review():
+    topics = sorted({key[1] for key in answer_key.values() if key[1]})
+    filter_col, topic_col = st.columns([2, 1])
+    with filter_col:
+        status = FILTERS[st.radio("Show", list(FILTERS), horizontal=True, key="result_filter")]
+    with topic_col:
+        topic = st.selectbox("Topic", ["All topics", *topics], key="result_topic") if topics else None
+        topic = None if topic == "All topics" else topic
+
+    # Back to the first page whenever the attempt or filter changes
+    page_key = "result_page"
+    if st.session_state.get("result_view") != (attempt_id, status, topic):
+        st.session_state.result_view = (attempt_id, status, topic)
+        st.session_state[page_key] = 0
+    page = st.session_state.get(page_key, 0)
+
+    keep = STATUS[status]
+    matching = [q_id for q_id in by_position
+                if q_id in answer_key
+                and keep(answers.get(q_id), sheet_key.get(q_id))
+                and (not topic or answer_key[q_id][1] == topic)]
+    if not matching:
+        st.info("No questions match this filter.")
+        return
+    matches = len(matching)
+    page = min(page, (matches - 1) // PAGE_SIZE)
+    rows = get_result_rows(tuple(matching[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]))
+    for q_id, question, a, b, c, d, n_attempts, n_correct, seconds in sorted(
+            rows, key=lambda r: slots[r[0]][0]):
+        pos, perm = slots[q_id]
+        selected = answers.get(q_id)
+        correct = sheet_key.get(q_id)
+        status_icon = "✅" if selected == correct else "❌" if selected else "⬜"
+        # Stored letters are canonical: show them as lettered on the candidate's screen
+        correct = to_display(perm, correct) if correct else correct
+        selected = to_display(perm, selected) if selected else selected
+        with st.expander(f"{status_icon} Q{pos}: {question}", expanded=False):
+            st.markdown(f"**Your Answer:** `{selected or 'Not answered'}`")
+            st.markdown(f"**Correct Answer:** `{correct}`")
+            if n_attempts:
+                # Running counters kept on submit: no scan of other users' answers
+                st.caption(f"📊 {percent_correct(n_attempts, n_correct)}% of {n_attempts} candidates got this right"
+                           + (f" · avg {seconds / n_attempts:.0f}s" if seconds else ""))
+
+            st.markdown("**Options:**")
+            for opt, txt in display_options(perm, (a, b, c, d)):
+                if not txt:
+                    continue
+                if opt == correct:
+                    st.markdown(f"- **{opt}. {txt}** ✅")
+                elif opt == selected:
+                    st.markdown(f"- ~~{opt}. {txt}~~ ❌")
+                else:
+                    st.markdown(f"- {opt}. {txt}")
+
+            if selected and selected != correct:
+                related = get_related(q_id)
+                if related:
+                    st.markdown("**🔗 Practise related questions:**")
+                    for text, related_topic, title in related:
+                        st.markdown(f"- {text}")
+                        st.caption(" · ".join(x for x in (title, related_topic) if x))
+
+            # Expander bodies are rendered up front: fetch the explanation only on request
+            if st.toggle("📘 Show explanation", key=f"explain_{q_id}"):
+                explanation = get_explanation(q_id)
+                st.info(f"📘 **Explanation:**\n\n{explanation or 'No explanation provided.'}")
+
+    pages = max(1, -(-matches // PAGE_SIZE))
+    if pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        if prev_col.button("⬅ Prev", key="result_prev", disabled=page == 0):
+            st.session_state[page_key] = page - 1
+            st.rerun(scope="fragment")
+        info_col.caption(f"Page {page + 1} of {pages} · {matches} questions")
+        if next_col.button("Next ➡", key="result_next", disabled=page >= pages - 1):
+            st.session_state[page_key] = page + 1
+            st.rerun(scope="fragment")
+
+review()
 
 st.markdown("---")
 
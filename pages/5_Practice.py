@@ -0,0 +1,95 @@
+# pages/5_Practice.py
+
+import streamlit as st
+import menu
+import auth
+import os
+from practice import load_mastery, next_question, update_mastery, record_answer, MASTERY_PRIOR
+
+DB_FILE = "master_questions.db"
+
+st.set_page_config(page_title="Adaptive Practice", layout="centered")
+st.session_state.current_page = os.path.basename(__file__)
+if not auth.restore_session():
+    st.switch_page("pages/1_Login.py")
+
+menu.top_menu()
+
+USER_ID = st.session_state.user_id
+
+# ===== SESSION STATE INIT =====
+# Mastery is read once per session and then updated in place; the DB copy is written behind
+if "practice_mastery" not in st.session_state:
+    st.session_state.practice_mastery = load_mastery(DB_FILE, USER_ID)
+    st.session_state.practice_seen = set()      # question ids shown this session
+    st.session_state.practice_last = None       # question answered just before the current one
+    st.session_state.practice_question = None
+    st.session_state.practice_feedback = None   # (selected, correct) once answered
+    st.session_state.practice_score = [0, 0]    # correct, answered
+
+mastery = st.session_state.practice_mastery
+
+if st.session_state.practice_question is None:
+    st.session_state.practice_question = next_question(DB_FILE, USER_ID, mastery,
+                                                       st.session_state.practice_seen,
+                                                       last=st.session_state.practice_last)
+    st.session_state.practice_feedback = None
+
+question = st.session_state.practice_question
+
+st.title("🎯 Adaptive Practice")
+correct_count, answered_count = st.session_state.practice_score
+st.caption(f"Questions come from your weakest topics, with missed questions brought back for review. "
+           f"This session: {correct_count}/{answered_count} correct")
+
+if question is None:
+    st.info("No questions available for practice yet.")
+    if st.button("🏠 Go to Dashboard"):
+        st.switch_page("pages/2_Dashboard.py")
+    st.stop()
+
+q_id, q_text, a, b, c, d, correct_opt, explanation, topic = question
+options_map = {"A": a, "B": b, "C": c, "D": d}
+st.markdown(f"**Topic:** {topic or 'General'} — mastery "
+            f"{mastery.get(topic, MASTERY_PRIOR):.0%}")
+st.subheader(q_text)
+
+feedback = st.session_state.practice_feedback
+selected = st.radio(
+    "Choose your answer:",
+    list(options_map.keys()),
+    format_func=lambda x: f"{x}. {options_map[x]}" if options_map[x] else x,
+    index=None if feedback is None else "ABCD".index(feedback[0]),
+    disabled=feedback is not None,
+    key=f"practice_answer_{q_id}"
+)
+
+if feedback is None:
+    if st.button("Submit Answer", disabled=selected is None):
+        is_correct = selected == correct_opt
+        new_mastery = update_mastery(mastery, topic, is_correct)
+        record_answer(DB_FILE, USER_ID, q_id, topic, is_correct, new_mastery)
+        st.session_state.practice_seen.add(q_id)
+        st.session_state.practice_score[0] += is_correct
+        st.session_state.practice_score[1] += 1
+        st.session_state.practice_feedback = (selected, is_correct)
+        st.rerun()
+else:
+    if feedback[1]:
+        st.success("✅ Correct!")
+    else:
+        st.error(f"❌ Wrong! Correct answer: {correct_opt}. {options_map.get(correct_opt, '')}")
+    if explanation:
+        st.info(f"**Explanation:** {explanation}")
+
+    if st.button("Next Question ➡", type="primary"):
+        st.session_state.practice_last = q_id
+        st.session_state.practice_question = None
+        st.rerun()
+
+st.markdown("---")
+if mastery:
+    with st.expander("📈 Your topic mastery"):
+        for name, value in sorted(mastery.items(), key=lambda t: t[1]):
+            st.caption(f"**{name or 'General'}**")
+            st.progress(value)
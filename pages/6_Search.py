@@ -0,0 +1,90 @@
+# pages/6_Search.py
+
+import streamlit as st
+import menu
+import auth
+import os
+import time
+from db.cache import cached_query
+from db.sqlite_connection import query
+from db.search import match_expression, count_matches, search_questions
+
+DB_FILE = "master_questions.db"
+PAGE_SIZE = 10  # results per page
+
+st.set_page_config(page_title="Search Questions", layout="wide")
+st.session_state.current_page = os.path.basename(__file__)
+if not auth.restore_session():
+    st.switch_page("pages/1_Login.py")
+
+menu.top_menu()
+
+# === Queries (FTS5 index: ranked matches without scanning questions) ===
+@cached_query(DB_FILE)
+def get_match_count(expression):
+    return count_matches(DB_FILE, expression)
+
+@cached_query(DB_FILE)
+def get_matches(expression, page):
+    return search_questions(DB_FILE, expression, PAGE_SIZE, page * PAGE_SIZE)
+
+@cached_query(DB_FILE)
+def get_paper_titles():
+    return dict(query("SELECT paper_id, title FROM papers", db_file=DB_FILE, label="search.paper_titles"))
+
+@cached_query(DB_FILE)
+def get_question_detail(question_id):
+    # Fetched only when a result is opened
+    return query("""
+        SELECT option_a, option_b, option_c, option_d, correct_option, explanation
+        FROM questions WHERE id = ?
+    """, (question_id,), db_file=DB_FILE, one=True, label="search.detail")
+
+st.title("🔎 Search Questions")
+text = st.text_input("Search the question bank", placeholder='e.g. cost of carry, "mark to market", hedg',
+                     key="search_text")
+expression = match_expression(text)
+if expression is None:
+    st.caption("Words must all appear (in the question, its options or explanation); "
+               "the last word also matches as a prefix. Use quotes for an exact phrase.")
+    st.stop()
+
+# Back to the first page whenever the search changes
+page_key = "search_page"
+if st.session_state.get("search_expression") != expression:
+    st.session_state.search_expression = expression
+    st.session_state[page_key] = 0
+
+started = time.perf_counter()
+total = get_match_count(expression)
+if not total:
+    st.info("No questions match this search.")
+    st.stop()
+pages = -(-total // PAGE_SIZE)
+page = min(st.session_state.get(page_key, 0), pages - 1)
+matches = get_matches(expression, page)
+st.caption(f"{total} matching questions · {(time.perf_counter() - started) * 1000:.1f} ms")
+
+titles = get_paper_titles()
+for q_id, paper_id, topic, question, explanation_snippet in matches:
+    with st.expander(question):
+        st.caption(f"**Topic:** {topic or 'General'} · **Paper:** {titles.get(paper_id, 'Generated')}")
+        if explanation_snippet:
+            st.caption(f"📘 {explanation_snippet}")
+        # Expander bodies are rendered up front: load the options only on request
+        if st.toggle("Show options and answer", key=f"search_detail_{q_id}"):
+            a, b, c, d, correct, explanation = get_question_detail(q_id)
+            for opt, txt in zip("ABCD", (a, b, c, d)):
+                if txt:
+                    st.markdown(f"- **{opt}. {txt}** ✅" if opt == correct else f"- {opt}. {txt}")
+            st.info(f"📘 **Explanation:**\n\n{explanation or 'No explanation provided.'}")
+
+if pages > 1:
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("⬅ Prev", key="search_prev", disabled=page == 0):
+        st.session_state[page_key] = page - 1
+        st.rerun()
+    info_col.caption(f"Page {page + 1} of {pages}")
+    if next_col.button("Next ➡", key="search_next", disabled=page >= pages - 1):
+        st.session_state[page_key] = page + 1
+        st.rerun()
@@ -0,0 +1,247 @@
+# papergen.py
+import os
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from array import array
+
+from db.cache import BANK, data_versions
+from db.sqlite_connection import query
+from db.writer import write
+from db.snapshots import GENERATED_TYPE, snapshot_path
+
+# ==== CONFIG ====
+MASTER_DB = "master_questions.db"
+STRATA_TTL = float(os.getenv("PAPERGEN_STRATA_TTL", "600"))  # rebuild strata at least this often (s)
+PRUNE_AFTER = float(os.getenv("PAPERGEN_PRUNE_AFTER", str(7 * 24 * 3600)))  # unused papers kept this long (s)
+PRUNE_EVERY = 24 * 3600  # create_paper prunes at most this often per process (s)
+PAPER_SIZE = 50
+BANDS = ("easy", "medium", "hard")
+DEFAULT_MIX = {"easy": 0.3, "medium": 0.5, "hard": 0.2}
+EASY_MAX = -0.5    # difficulty (IRT b, logit scale) below this is easy
+HARD_MIN = 0.5     # ... above this is hard; unrated questions count as medium
+MIN_ANSWERS = 10   # answers needed before question_stats is trusted for a difficulty
+INSTRUCTIONS = "Generated mock paper: questions drawn across topics and difficulty levels."
+
+_strata = {}  # db_file -> (version, built_at, {(band, topic): array of question ids})
+_strata_lock = threading.Lock()
+_last_prune = {}  # db_file -> time.time() of this process's last prune
+
+
+# ==== STRATA ====
+def band_of(difficulty):
+    if difficulty is None:
+        return "medium"
+    if difficulty < EASY_MAX:
+        return "easy"
+    return "hard" if difficulty > HARD_MIN else "medium"
+
+
+def strata_index(db_file=MASTER_DB):
+    """{(band, topic): array('q') of question ids in id order}, shared by every session.
+
+    Difficulty is the calibrated IRT b when there is one, else the logit of
+    the question's error rate from question_stats. Built with one pass over
+    (id, topic, difficulty); rebuilt when the bank version moves, the bank is
+    recalibrated or after STRATA_TTL.
+    """
+    version = (data_versions(db_file, (BANK,)),
+               query("SELECT MAX(calibrated_at) FROM question_irt",
+                     db_file=db_file, one=True, label="papergen.calibrated_at")[0])
+    entry = _strata.get(db_file)
+    if entry and entry[0] == version and time.time() - entry[1] < STRATA_TTL:
+        return entry[2]
+
+    with _strata_lock:
+        entry = _strata.get(db_file)
+        if entry and entry[0] == version and time.time() - entry[1] < STRATA_TTL:
+            return entry[2]
+        strata = {}
+        for q_id, topic, difficulty, answered, correct in query("""
+            SELECT q.id, IFNULL(q.topic, ''), irt.difficulty, s.answered, s.correct
+            FROM questions q
+            LEFT JOIN question_irt irt ON irt.question_id = q.id
+            LEFT JOIN question_stats s ON s.question_id = q.id
+            WHERE q.question IS NOT NULL AND q.correct_option IS NOT NULL AND q.retired_at IS NULL
+            ORDER BY q.id
+        """, db_file=db_file, label="papergen.build_strata"):
+            if difficulty is None and answered and answered >= MIN_ANSWERS:
+                difficulty = math.log((answered - correct + 0.5) / (correct + 0.5))
+            key = (band_of(difficulty), topic)
+            ids = strata.get(key)
+            if ids is None:
+                ids = strata[key] = array("q")
+            ids.append(q_id)
+        _strata[db_file] = (version, time.time(), strata)
+        return strata
+
+
+# ==== SAMPLING ====
+def _apportion(n, weights, caps, rnd):
+    """Split n into integer shares proportional to weights, none above its cap (largest remainder)"""
+    counts = [0] * len(weights)
+    open_ = [i for i, cap in enumerate(caps) if cap > 0 and weights[i] > 0]
+    while n > 0 and open_:
+        total = sum(weights[i] for i in open_)
+        quotas = {i: n * weights[i] / total for i in open_}
+        shares = {i: min(int(quotas[i]), caps[i] - counts[i]) for i in open_}
+        # Remainders go to the largest fractional parts, ties broken by the seeded generator
+        order = sorted(open_, key=lambda i: (quotas[i] - int(quotas[i]), rnd.random()), reverse=True)
+        left = n - sum(shares.values())
+        for i in order:
+            if left == 0:
+                break
+            if shares[i] < caps[i] - counts[i]:
+                shares[i] += 1
+                left -= 1
+        for i, k in shares.items():
+            counts[i] += k
+        n -= sum(shares.values())
+        open_ = [i for i in open_ if counts[i] < caps[i]]
+    return counts
+
+
+def generate_question_ids(strata, n=PAPER_SIZE, seed=0, mix=None):
+    """n distinct question ids: bands in the mix's proportions, topics by their share of each band.
+
+    Pure function of (strata, n, seed, mix), so a seed identifies a paper for
+    a given bank. Costs O(strata + n): only the picked positions are touched.
+    """
+    rnd = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    keys = sorted(strata)
+    band_sizes = [sum(len(strata[k]) for k in keys if k[0] == band) for band in BANDS]
+    band_counts = _apportion(n, [mix.get(band, 0) for band in BANDS], band_sizes, rnd)
+    if sum(band_counts) < n:  # a band of the mix is short: fill from the others by size
+        extra = _apportion(n - sum(band_counts), band_sizes,
+                           [size - k for size, k in zip(band_sizes, band_counts)], rnd)
+        band_counts = [k + e for k, e in zip(band_counts, extra)]
+
+    picked = []
+    for band, k in zip(BANDS, band_counts):
+        band_keys = [key for key in keys if key[0] == band]
+        sizes = [len(strata[key]) for key in band_keys]
+        for key, count in zip(band_keys, _apportion(k, sizes, sizes, rnd)):
+            if count:
+                ids = strata[key]
+                picked.extend(ids[i] for i in rnd.sample(range(len(ids)), count))
+    picked.sort()  # papers list their questions in id order
+    return picked
+
+
+# ==== PAPERS ====
+def _spec(n, mix):
+    return json.dumps({"n": n, "mix": mix or DEFAULT_MIX}, sort_keys=True)
+
+
+def _save_paper(cursor, seed, spec, question_ids, now):
+    row = cursor.execute("SELECT paper_id FROM generated_papers WHERE seed = ? AND spec = ?",
+                         (seed, spec)).fetchone()
+    if row:  # another session generated the same paper first
+        return row[0]
+    cursor.execute("INSERT INTO papers (title, type, instructions, total_questions) VALUES (?, ?, ?, ?)",
+                   (f"Generated mock #{seed}", GENERATED_TYPE, INSTRUCTIONS, len(question_ids)))
+    paper_id = cursor.lastrowid
+    cursor.execute("INSERT INTO generated_papers (paper_id, seed, spec, created_at) VALUES (?, ?, ?, ?)",
+                   (paper_id, seed, spec, now))
+    cursor.executemany("INSERT INTO generated_paper_questions (paper_id, question_id) VALUES (?, ?)",
+                       [(paper_id, q_id) for q_id in question_ids])
+    return paper_id
+
+
+def _prune(cursor, before):
+    # Generated papers nobody attempted: no history, progress or open attempt points at them
+    stale = [r[0] for r in cursor.execute("""
+        SELECT g.paper_id FROM generated_papers g
+        WHERE g.created_at < ?
+          AND g.paper_id NOT IN (SELECT paper_id FROM attempts)
+          AND g.paper_id NOT IN (SELECT paper_id FROM attempt_journal)
+          AND g.paper_id NOT IN (SELECT paper_id FROM user_progress)
+    """, (before,))]
+    for table in ("generated_paper_questions", "generated_papers", "papers"):
+        cursor.executemany(f"DELETE FROM {table} WHERE paper_id = ?", [(pid,) for pid in stale])
+    return stale
+
+
+def prune_papers(db_file=MASTER_DB, older_than=PRUNE_AFTER):
+    """Delete generated papers older than older_than seconds that were never attempted; returns their ids"""
+    stale = write(_prune, time.time() - older_than, db_file=db_file, label="papergen.prune")
+    for paper_id in stale:
+        try:  # only there if someone published snapshots of every paper
+            os.remove(snapshot_path(paper_id))
+        except FileNotFoundError:
+            pass
+    return stale
+
+
+def find_paper(db_file, seed, n=PAPER_SIZE, mix=None):
+    row = query("SELECT paper_id FROM generated_papers WHERE seed = ? AND spec = ?",
+                (seed, _spec(n, mix)), db_file=db_file, one=True, label="papergen.find")
+    return row[0] if row else None
+
+
+def create_paper(db_file=MASTER_DB, n=PAPER_SIZE, seed=None, mix=None):
+    """paper_id of the generated paper for (seed, n, mix), creating it on first use.
+
+    The drawn question ids are stored with the paper, so it stays the same
+    paper for attempts, results and history even after the bank changes.
+    """
+    if seed is None:
+        seed = random.randrange(1, 10 ** 9)
+    paper_id = find_paper(db_file, seed, n, mix)
+    if paper_id is not None:
+        return paper_id
+    question_ids = generate_question_ids(strata_index(db_file), n, seed, mix)
+    if not question_ids:
+        raise ValueError("The question bank is empty")
+    paper_id = write(_save_paper, seed, _spec(n, mix), question_ids, time.time(),
+                     db_file=db_file, label="papergen.create")
+
+    # Papers generated and never started would otherwise pile up: sweep now and then
+    if time.time() - _last_prune.get(db_file, 0) > PRUNE_EVERY:
+        _last_prune[db_file] = time.time()
+        prune_papers(db_file)
+    return paper_id
+
+
+# ==== SIMULATION (speed check, no DB) ====
+def simulate(n_questions, n_topics, paper_size, runs=200, seed=0):
+    rnd = random.Random(seed)
+    started = time.perf_counter()
+    strata = {}
+    for q_id in range(1, n_questions + 1):
+        key = (rnd.choice(BANDS), f"topic {rnd.randrange(n_topics)}")
+        strata.setdefault(key, array("q")).append(q_id)
+    built = time.perf_counter()
+
+    for s in range(runs):
+        generate_question_ids(strata, paper_size, s)
+    elapsed = (time.perf_counter() - built) / runs
+    assert generate_question_ids(strata, paper_size, 7) == generate_question_ids(strata, paper_size, 7)
+    print(f"{n_questions:,} questions in {len(strata)} strata (built in {built - started:.2f}s) "
+          f"→ {paper_size}-question paper in {elapsed * 1000:.2f} ms")
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a stratified, seed-reproducible mock paper")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    parser.add_argument("--size", type=int, default=PAPER_SIZE)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--simulate", type=int, nargs=2, metavar=("QUESTIONS", "TOPICS"),
+                        help="Time generation over a synthetic bank instead of the DB")
+    parser.add_argument("--prune", type=float, metavar="DAYS",
+                        help="Delete generated papers older than DAYS that were never attempted")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(*args.simulate, args.size)
+    elif args.prune is not None:
+        pruned = prune_papers(args.db_file, args.prune * 24 * 3600)
+        print(f"🧹 Pruned {len(pruned)} unused generated paper(s)")
+    else:
+        paper_id = create_paper(args.db_file, args.size, args.seed)
+        print(f"✅ Generated paper {paper_id} ({args.size} questions)")
@@ -0,0 +1,166 @@
+# practice.py
+import os
+import time
+import random
+import threading
+from array import array
+
+from db.cache import BANK, data_versions
+from db.sqlite_connection import query
+from db.writer import get_writer
+
+# ==== CONFIG ====
+INDEX_TTL = float(os.getenv("PRACTICE_INDEX_TTL", "600"))  # rebuild candidate indexes at least this often (s)
+MASTERY_PRIOR = 0.5       # estimate for a topic the user has not practised
+MASTERY_RATE = 0.3        # weight of the newest answer in the running estimate
+EXPLORE = 0.1             # keeps mastered topics in rotation
+# Leitner boxes: wait before showing a question again, by number of correct answers in a row
+REVIEW_INTERVALS = [10 * 60, 60 * 60, 24 * 3600, 3 * 24 * 3600, 7 * 24 * 3600, 21 * 24 * 3600]
+
+_indexes = {}  # db_file -> (bank version, built_at, {topic: array of question ids})
+_indexes_lock = threading.Lock()
+
+
+# ==== CANDIDATE INDEXES ====
+def candidate_index(db_file):
+    """{topic: array('q') of answerable question ids}, shared by every session.
+
+    Built from (topic, id) pairs only, never the question text. Rebuilt when
+    the bank version moves (questions added, edited or retired) or after
+    INDEX_TTL; answers written meanwhile do not invalidate it.
+    """
+    version = data_versions(db_file, (BANK,))
+    entry = _indexes.get(db_file)
+    if entry and entry[0] == version and time.time() - entry[1] < INDEX_TTL:
+        return entry[2]
+
+    with _indexes_lock:
+        entry = _indexes.get(db_file)
+        if entry and entry[0] == version and time.time() - entry[1] < INDEX_TTL:
+            return entry[2]
+        index = {}
+        for topic, q_id in query("""
+            SELECT IFNULL(topic, ''), id FROM questions
+            WHERE question IS NOT NULL AND correct_option IS NOT NULL AND retired_at IS NULL
+        """, db_file=db_file, label="practice.build_index"):
+            ids = index.get(topic)
+            if ids is None:
+                ids = index[topic] = array("q")
+            ids.append(q_id)
+        _indexes[db_file] = (version, time.time(), index)
+        return index
+
+
+def get_question(db_file, question_id):
+    """(id, question, a, b, c, d, correct_option, explanation, topic) by primary key; None once retired"""
+    return query("""
+        SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation,
+               IFNULL(topic, '')
+        FROM questions
+        WHERE id = ? AND retired_at IS NULL
+    """, (question_id,), db_file=db_file, one=True, label="practice.question")
+
+
+def sample_questions(db_file, k, rnd=random):
+    """k distinct random questions from the whole bank, loading only those k rows"""
+    index = candidate_index(db_file)
+    sizes = [len(ids) for ids in index.values()]
+    total = sum(sizes)
+    picks = rnd.sample(range(total), min(k, total))
+    pools = list(index.values())
+    rows = []
+    for n in picks:
+        # Position n in the concatenation of the per-topic arrays
+        for ids in pools:
+            if n < len(ids):
+                rows.append(get_question(db_file, ids[n]))
+                break
+            n -= len(ids)
+    return rows
+
+
+# ==== PER-USER STATE ====
+def load_mastery(db_file, user_id):
+    """{topic: mastery in [0, 1]}"""
+    return dict(query("""
+        SELECT topic, mastery FROM user_topic_mastery WHERE user_id = ?
+    """, (user_id,), db_file=db_file, label="practice.mastery"))
+
+
+def due_reviews(db_file, user_id, now=None, limit=20):
+    """Question ids whose spaced-repetition review is due, oldest first"""
+    return [r[0] for r in query("""
+        SELECT question_id FROM user_question_review
+        WHERE user_id = ? AND due_at <= ?
+        ORDER BY due_at
+        LIMIT ?
+    """, (user_id, now or time.time(), limit), db_file=db_file, label="practice.due_reviews")]
+
+
+def next_question(db_file, user_id, mastery, exclude=(), rnd=random, last=None):
+    """Pick the next question: a due review if any, else a random one from a weak topic.
+
+    `exclude` (questions seen this session) only applies to new picks, so a
+    question missed earlier in the session comes back once its review is
+    due. `last` is the question just answered: its new due date may still be
+    queued in the writer. Each pick costs one indexed lookup for reviews, a
+    weighted choice over topics and one primary-key fetch; the bank is never
+    loaded.
+    """
+    for q_id in due_reviews(db_file, user_id):
+        row = get_question(db_file, q_id) if q_id != last else None
+        if row:  # skip reviews of questions removed from the bank
+            return row
+
+    index = candidate_index(db_file)
+    topics = [t for t, ids in index.items() if ids]
+    if not topics:
+        return None
+    weights = [1.0 - mastery.get(t, MASTERY_PRIOR) + EXPLORE for t in topics]
+    for _ in range(10):
+        ids = index[rnd.choices(topics, weights)[0]]
+        q_id = ids[rnd.randrange(len(ids))]
+        if q_id not in exclude:
+            return get_question(db_file, q_id)
+    return get_question(db_file, q_id)  # small bank: everything seen this session
+
+
+def update_mastery(mastery, topic, correct):
+    """New running estimate for topic after one answer (also updates the session's dict)"""
+    m = mastery.get(topic, MASTERY_PRIOR)
+    mastery[topic] = m + MASTERY_RATE * (float(correct) - m)
+    return mastery[topic]
+
+
+# ==== WRITES (write-behind through the single writer) ====
+def _record(cursor, user_id, question_id, topic, correct, mastery, now):
+    cursor.execute("""
+        INSERT INTO user_topic_mastery (user_id, topic, mastery, answered, correct, updated_at)
+        VALUES (?, ?, ?, 1, ?, ?)
+        ON CONFLICT(user_id, topic) DO UPDATE SET
+            mastery = excluded.mastery,
+            answered = answered + 1,
+            correct = correct + excluded.correct,
+            updated_at = excluded.updated_at
+    """, (user_id, topic, mastery, int(correct), now))
+
+    row = cursor.execute("""
+        SELECT box FROM user_question_review WHERE user_id = ? AND question_id = ?
+    """, (user_id, question_id)).fetchone()
+    box = min((row[0] + 1) if row else 1, len(REVIEW_INTERVALS) - 1) if correct else 0
+    cursor.execute("""
+        INSERT INTO user_question_review (user_id, question_id, box, due_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, question_id) DO UPDATE SET box = excluded.box, due_at = excluded.due_at
+    """, (user_id, question_id, box, now + REVIEW_INTERVALS[box]))
+
+
+def _logged(future):
+    if future.exception() is not None:
+        print(f"❌ Practice write failed: {future.exception()}")
+
+
+def record_answer(db_file, user_id, question_id, topic, correct, mastery):
+    """Persist one practice answer; returns at once (the writer thread commits it)"""
+    get_writer(db_file).submit(_record, user_id, question_id, topic, correct, mastery, time.time(),
+                               label="practice.record").add_done_callback(_logged)
@@ -0,0 +1,97 @@
+# shuffle.py
+import re
+import random
+import functools
+import itertools
+from array import array
+
+from db.cache import LRUCache, PAPER_CACHE_SIZE
+
+OPTIONS = "ABCD"
+PERMUTATIONS = tuple(itertools.permutations(range(len(OPTIONS))))  # 24; index 0 is the identity
+IDENTITY = 0
+
+# Options that refer to other options by position ("All of the above", "Both A and B") keep A-D order
+POSITIONAL = re.compile(r"\b(above|below)\b|\b(all|none|both|either|neither) of\b|\b[A-D] (and|or|&) [A-D]\b",
+                        re.IGNORECASE)
+
+
+def _table(mapping):
+    table = bytearray(range(256))
+    for src, dst in mapping.items():
+        table[ord(src)] = ord(dst)
+    return bytes(table)
+
+
+# Under permutation p the option displayed as letter k is canonical option PERMUTATIONS[p][k].
+# TO_CANONICAL[p] / TO_DISPLAY[p] are bytes.translate tables between the two lettering schemes.
+TO_CANONICAL = tuple(_table({OPTIONS[k]: OPTIONS[c] for k, c in enumerate(perm)}) for perm in PERMUTATIONS)
+TO_DISPLAY = tuple(_table({OPTIONS[c]: OPTIONS[k] for k, c in enumerate(perm)}) for perm in PERMUTATIONS)
+
+
+def to_canonical(perm, letter):
+    return chr(TO_CANONICAL[perm][ord(letter)])
+
+
+def to_display(perm, letter):
+    return chr(TO_DISPLAY[perm][ord(letter)])
+
+
+def display_options(perm, options):
+    """[(displayed letter, text)] for canonical option texts (a, b, c, d) under permutation perm"""
+    return [(OPTIONS[k], options[c]) for k, c in enumerate(PERMUTATIONS[perm])]
+
+
+# ==== LAYOUTS ====
+_pinned = LRUCache(PAPER_CACHE_SIZE)
+
+
+def pinned_questions(paper):
+    """One byte per question of paper, 1 where its options must keep their A-D order"""
+    # The paper itself is the signature: the same shared object compares equal field by field
+    # at identity cost, and a republished paper is a new object
+    hit, pinned = _pinned.get(paper.paper_id, paper)
+    if not hit:
+        pinned = pinned_options(q[2:6] for q in paper.questions)
+        _pinned.put(paper.paper_id, paper, pinned)
+    return pinned
+
+
+def pinned_options(options):
+    """One byte per (a, b, c, d) in options, 1 where they must keep their A-D order"""
+    return bytes(any(opt and POSITIONAL.search(str(opt)) for opt in q) for q in options)
+
+
+@functools.lru_cache(maxsize=1024)
+def _layout(seed, pinned):
+    n = len(pinned)
+    if seed is None:
+        return array("H", range(n)), bytes(n)
+    rnd = random.Random(seed)
+    order = list(range(n))
+    rnd.shuffle(order)
+    perms = bytes(IDENTITY if p else rnd.randrange(len(PERMUTATIONS)) for p in pinned)
+    return array("H", order), perms
+
+
+def layout(seed, paper):
+    """(order, perms) of one attempt, derived from its seed alone so nothing is stored.
+
+    order[pos] is the index in paper.questions shown at position pos;
+    perms[i] is the option permutation of question i. A seed of None is the
+    paper's own order (attempts from before shuffling).
+    """
+    return _layout(seed, pinned_questions(paper))
+
+
+def sheet_layout(seed, pinned):
+    """layout() for a stored answer sheet from the pinned bytes kept with it (see pinned_questions)"""
+    return _layout(seed, bytes(pinned))
+
+
+def positions(order):
+    """Inverse of order: the displayed position of each question index"""
+    inverse = array("H", bytes(2 * len(order)))
+    for pos, i in enumerate(order):
+        inverse[i] = pos
+    return inverse
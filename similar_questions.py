@@ -0,0 +1,193 @@
+import re
+import math
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+from scipy import sparse
+
+from db.cache import BANK, BUMP
+from db.migrations import migrate
+
+# ==== CONFIG ====
+MASTER_DB = "master_questions.db"
+TOP_K = 5              # neighbours kept per question
+MIN_SCORE = 0.1        # cosine similarity below this is not "related"
+MAX_DF = 0.5           # terms in more than this share of questions carry no signal
+BATCH_SIZE = 256       # rows per similarity block: BATCH_SIZE x questions float32 in memory
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be by can for from has have if in into is it its may not of on or that the
+    their there these this to was were which will with what when who whom why how does do
+    following statement statements correct incorrect true false given
+""".split())
+
+
+# ==== DATA ====
+def load_documents(conn):
+    """(question ids, paper ids, texts) for every live question; text = question + explanation"""
+    rows = conn.execute("""
+        SELECT id, paper_id, IFNULL(question, '') || ' ' || IFNULL(explanation, '')
+        FROM questions
+        WHERE retired_at IS NULL
+        ORDER BY id
+    """).fetchall()
+    if not rows:
+        return None
+    ids, papers, texts = zip(*rows)
+    return np.array(ids, dtype=np.int64), np.array(papers, dtype=np.int64), texts
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+# ==== MODEL ====
+def tfidf_matrix(texts, max_df=MAX_DF):
+    """L2-normalised CSR matrix (questions x terms) of sublinear tf x smoothed idf"""
+    vocabulary = {}
+    indptr, indices, counts = [0], [], []
+    for text in texts:
+        tf = {}
+        for token in tokenize(text):
+            j = vocabulary.setdefault(token, len(vocabulary))
+            tf[j] = tf.get(j, 0) + 1
+        indices.extend(tf)
+        counts.extend(tf.values())
+        indptr.append(len(indices))
+
+    n = len(texts)
+    X = sparse.csr_matrix((np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32),
+                           np.asarray(indptr, dtype=np.int64)), shape=(n, len(vocabulary)))
+    X.data = 1.0 + np.log(X.data)
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    # Terms seen once cannot link two questions; very common ones link everything
+    idf[(df < 2) | (df > max_df * n)] = 0.0
+    X = X.multiply(idf.astype(np.float32)).tocsr()
+    X.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ X
+
+
+def top_neighbours(X, papers, k=TOP_K, batch_size=BATCH_SIZE, min_score=MIN_SCORE):
+    """(neighbour index array n x k, score array n x k) by cosine similarity, other papers only.
+
+    Each block of rows is one sparse x dense product X @ X[block].T, whose
+    dense batch_size x n result is cut to its k best columns with argpartition;
+    missing neighbours are -1.
+    """
+    n = X.shape[0]
+    k = min(k, max(n - 1, 0))
+    neighbours = np.full((n, k), -1, dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return neighbours, scores
+
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        # Block similarities are mostly non-zero: a sparse x sparse product would spend
+        # its time building the sparse result, so multiply by the dense block instead
+        S = np.ascontiguousarray((X @ X[start:stop].T.toarray()).T)
+        # Same paper (which includes the question itself) is not a recommendation
+        S[papers[start:stop, None] == papers[None, :]] = 0.0
+
+        best = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(S, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        weak = best_scores < min_score
+        best[weak] = -1
+        best_scores[weak] = 0.0
+        neighbours[start:stop] = best
+        scores[start:stop] = best_scores
+    return neighbours, scores
+
+
+# ==== WRITE BACK ====
+def save_neighbours(conn, ids, neighbours, scores):
+    rows = [
+        (int(ids[i]), rank, int(ids[j]), float(scores[i, rank]))
+        for i in range(len(ids))
+        for rank, j in enumerate(neighbours[i])
+        if j >= 0
+    ]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM question_neighbours")
+        conn.executemany("""
+            INSERT INTO question_neighbours (question_id, rank, neighbour_id, score)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        conn.execute(BUMP, (BANK,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+
+def build(db_file=MASTER_DB, k=TOP_K, batch_size=BATCH_SIZE, min_score=MIN_SCORE):
+    migrate(db_file)
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        started = time.perf_counter()
+        data = load_documents(conn)
+        if data is None:
+            print("⚠ No questions to index")
+            return 0
+        ids, papers, texts = data
+        X = tfidf_matrix(texts)
+        vectorised = time.perf_counter()
+
+        neighbours, scores = top_neighbours(X, papers, k, batch_size, min_score)
+        searched = time.perf_counter()
+
+        saved = save_neighbours(conn, ids, neighbours, scores)
+        print(f"✅ {len(ids)} questions, {X.shape[1]} terms, {X.nnz:,} weights → {saved} neighbour links "
+              f"(tf-idf {vectorised - started:.2f}s, top-{k} {searched - vectorised:.2f}s)")
+        return saved
+    finally:
+        conn.close()
+
+
+# ==== SIMULATION (speed check, no DB) ====
+def simulate(n_questions, n_papers, k=TOP_K, batch_size=BATCH_SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    # Zipf-distributed words over a finance-sized vocabulary, ~40 words per question
+    words = [f"w{i}" for i in range(20000)]
+    picks = np.minimum(rng.zipf(1.3, size=(n_questions, 40)), len(words)) - 1
+    texts = [" ".join(words[j] for j in row) for row in picks]
+    papers = rng.integers(0, n_papers, n_questions)
+
+    started = time.perf_counter()
+    X = tfidf_matrix(texts)
+    vectorised = time.perf_counter()
+    neighbours, _ = top_neighbours(X, papers, k, batch_size)
+    searched = time.perf_counter()
+    print(f"{n_questions:,} questions, {X.shape[1]} terms, {X.nnz:,} weights → "
+          f"tf-idf {vectorised - started:.2f}s, top-{k} {searched - vectorised:.2f}s "
+          f"({math.ceil(n_questions / batch_size)} blocks of {batch_size}); "
+          f"{(neighbours >= 0).mean():.0%} of slots filled")
+
+
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute related questions by TF-IDF cosine similarity")
+    parser.add_argument("db_file", nargs="?", default=MASTER_DB)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+    parser.add_argument("--simulate", type=int, nargs=2, metavar=("QUESTIONS", "PAPERS"),
+                        help="Time the job on synthetic text instead of the DB")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(*args.simulate, k=args.top_k, batch_size=args.batch_size)
+    else:
+        build(args.db_file, args.top_k, args.batch_size, args.min_score)
@@ -1,10 +1,10 @@
-import sqlite3
 import streamlit as st
 import random
 import time
 import datetime
 import json
 import os
+from db.sqlite_connection import query
 
 DB_FILE = "nism_questions.db"
 
@@ -14,16 +14,11 @@ def get_all_questions():
         st.error(f"❌ Database file not found: {DB_FILE}")
         return []
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("""
+        return query("""
             SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation
             FROM questions
             WHERE question IS NOT NULL AND TRIM(question) != ''
-        """)
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        """, db_file=DB_FILE, label="testmock.all_questions")
     except Exception as e:
         st.error(f"❌ Error reading DB: {e}")
         return []
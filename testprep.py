@@ -1,21 +1,8 @@
-import sqlite3
 import streamlit as st
-import random
+from practice import sample_questions
+from db.migrations import migrate
 
-DB_FILE = "nism_questions.db"
-
-# ==== DB HELPER ====
-def get_all_questions():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, question, option_a, option_b, option_c, option_d, correct_option, explanation
-        FROM questions
-        WHERE question IS NOT NULL AND correct_option IS NOT NULL
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+DB_FILE = "master_questions.db"  # the merged, migrated bank (per-paper source DBs have no retired_at)
 
 # ==== QUIZ UI ====
 st.set_page_config(page_title="NISM Quiz", layout="centered")
@@ -24,7 +11,8 @@ st.title("📚 NISM Practice Quiz")
 if "score" not in st.session_state:
     st.session_state.score = 0
 if "questions" not in st.session_state:
-    st.session_state.questions = random.sample(get_all_questions(), 10)  # 10 random Qs
+    migrate(DB_FILE)  # no-op once the DB is current
+    st.session_state.questions = sample_questions(DB_FILE, 10)  # 10 random Qs, loading only those rows
     st.session_state.current_q = 0
     st.session_state.answers = {}
 
@@ -32,7 +20,7 @@ questions = st.session_state.questions
 current_q_idx = st.session_state.current_q
 
 if current_q_idx < len(questions):
-    q_id, q_text, a, b, c, d, correct_opt, explanation = questions[current_q_idx]
+    q_id, q_text, a, b, c, d, correct_opt, explanation, _ = questions[current_q_idx]
 
     st.subheader(f"Q{current_q_idx+1}. {q_text}")
     options_map = {"A": a, "B": b, "C": c, "D": d}
@@ -78,7 +66,7 @@ else:
 
     if st.button("Restart Quiz"):
         st.session_state.score = 0
-        st.session_state.questions = random.sample(get_all_questions(), 10)
+        st.session_state.questions = sample_questions(DB_FILE, 10)
         st.session_state.current_q = 0
         st.session_state.answers = {}
         st.rerun()
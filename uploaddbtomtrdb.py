@@ -1,79 +1,218 @@
 import sqlite3
+import hashlib
 import os
+import time
+import argparse
+from datetime import datetime
+
+from db import search
+from db.migrations import migrate
+from db.questions import register_functions
+from db.snapshots import publish_papers
 
 # Folder containing your existing DBs
 DB_FOLDER = "dbs"  # change to your folder path
 MASTER_DB = "master_questions.db"
+DEFAULT_INSTRUCTIONS = "Answer all questions carefully."
+
+QUESTION_COLUMNS = ("question, option_a, option_b, option_c, option_d, "
+                    "correct_answer, correct_option, explanation, topic")
+
+
+# ==== HELPERS ====
+def file_checksum(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_paper(mcur, db_file, paper_title, paper_type):
+    """Find the paper a source file was merged into before, or create one"""
+    row = mcur.execute("SELECT paper_id FROM source_files WHERE file_name = ?",
+                       (db_file,)).fetchone()
+    if row:
+        return row[0]
+
+    # Masters built before source_files existed: adopt the unclaimed paper with the same title
+    # that shares the most questions with the source (titles alone repeat across papers)
+    candidates = mcur.execute("""
+        SELECT p.paper_id,
+               (SELECT COUNT(*) FROM questions q
+                WHERE q.paper_id = p.paper_id
+                  AND q.question_hash IN (SELECT qhash(question) FROM src.questions)) AS overlap
+        FROM papers p
+        WHERE p.title = ? AND p.type = ?
+          AND p.paper_id NOT IN (SELECT paper_id FROM source_files)
+        ORDER BY overlap DESC, p.paper_id
+    """, (paper_title, paper_type)).fetchall()
+    if candidates and candidates[0][1] > 0:
+        if len(candidates) > 1 and candidates[1][1] == candidates[0][1]:
+            tied = [pid for pid, overlap in candidates if overlap == candidates[0][1]]
+            raise ValueError(f"{db_file}: papers {tied} titled {paper_title!r} share {candidates[0][1]} "
+                             f"questions each with it; record the right one in source_files first")
+        return candidates[0][0]
+
+    mcur.execute("INSERT INTO papers (title, type, instructions, total_questions) VALUES (?, ?, ?, ?)",
+                 (paper_title, paper_type, DEFAULT_INSTRUCTIONS, 0))
+    return mcur.lastrowid
+
+
+def merge_source(master_conn, db_path, db_file, checksum):
+    """Sync one attached source DB into its paper with set-based statements.
+
+    Source and master questions are paired on (question_hash, occurrence), the
+    nth copy of the same normalized text, so ids stay stable for user_answers
+    and attempts. Questions gone from the source are retired, not deleted:
+    answers, stats and attempt history keep pointing at a real row.
+    """
+    mcur = master_conn.cursor()
+
+    # Decide paper type
+    paper_type = "mock" if "mock" in db_file.lower() else "practice"
+    paper_title = os.path.splitext(db_file)[0]
+
+    mcur.execute("ATTACH DATABASE ? AS src", (db_path,))
+    try:
+        mcur.execute("BEGIN")
+        paper_id = resolve_paper(mcur, db_file, paper_title, paper_type)
+
+        mcur.execute(f"""
+            CREATE TEMP TABLE incoming AS
+            SELECT qhash(question) AS question_hash,
+                   ROW_NUMBER() OVER (PARTITION BY qhash(question) ORDER BY id) - 1 AS occurrence,
+                   id AS src_id, {QUESTION_COLUMNS}
+            FROM src.questions
+        """)
+        mcur.execute("CREATE UNIQUE INDEX temp.idx_incoming_key ON incoming(question_hash, occurrence)")
 
-# Create Master DB
-master_conn = sqlite3.connect(MASTER_DB)
-mcur = master_conn.cursor()
-
-# Create schema
-mcur.execute("""
-CREATE TABLE IF NOT EXISTS papers (
-    paper_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT NOT NULL,
-    type TEXT NOT NULL,
-    instructions TEXT,
-    total_questions INTEGER
-);
-""")
-
-mcur.execute("""
-CREATE TABLE IF NOT EXISTS questions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paper_id INTEGER NOT NULL,
-    question TEXT NOT NULL,
-    option_a TEXT,
-    option_b TEXT,
-    option_c TEXT,
-    option_d TEXT,
-    correct_answer TEXT,
-    correct_option CHAR(1),
-    explanation TEXT,
-    topic TEXT,
-    FOREIGN KEY (paper_id) REFERENCES papers(paper_id)
-);
-""")
-
-# Loop over each DB and merge
-for db_file in os.listdir(DB_FOLDER):
-    if db_file.endswith(".db"):
-        db_path = os.path.join(DB_FOLDER, db_file)
-
-        # Decide paper type
-        paper_type = "mock" if "mock" in db_file.lower() else "practice"
-        paper_title = os.path.splitext(db_file)[0]
-        
-        print(f"📥 Importing from {db_file} ({paper_type})")
-
-        # Insert into papers table
-        mcur.execute("INSERT INTO papers (title, type, instructions, total_questions) VALUES (?, ?, ?, ?)",
-                     (paper_title, paper_type, "Answer all questions carefully.", 0))
-        paper_id = mcur.lastrowid
-
-        # Read old DB
-        old_conn = sqlite3.connect(db_path)
-        ocur = old_conn.cursor()
-        ocur.execute("SELECT question, option_a, option_b, option_c, option_d, correct_answer, correct_option, explanation, topic FROM questions")
-        rows = ocur.fetchall()
-
-        # Insert questions
-        for row in rows:
-            mcur.execute("""
-                INSERT INTO questions 
-                (paper_id, question, option_a, option_b, option_c, option_d, correct_answer, correct_option, explanation, topic)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (paper_id, *row))
+        # Update (and bring back) questions still in the source.
+        # Only rows that actually changed are written, so the search index is touched for those alone
+        mcur.execute("""
+            UPDATE questions
+            SET question = i.question,
+                option_a = i.option_a, option_b = i.option_b,
+                option_c = i.option_c, option_d = i.option_d,
+                correct_answer = i.correct_answer, correct_option = i.correct_option,
+                explanation = i.explanation, topic = i.topic,
+                retired_at = NULL
+            FROM incoming i
+            WHERE questions.paper_id = ?
+              AND questions.question_hash = i.question_hash AND questions.occurrence = i.occurrence
+              AND (questions.retired_at IS NOT NULL OR questions.question IS NOT i.question
+                   OR questions.option_a IS NOT i.option_a OR questions.option_b IS NOT i.option_b
+                   OR questions.option_c IS NOT i.option_c OR questions.option_d IS NOT i.option_d
+                   OR questions.correct_answer IS NOT i.correct_answer
+                   OR questions.correct_option IS NOT i.correct_option
+                   OR questions.explanation IS NOT i.explanation OR questions.topic IS NOT i.topic)
+        """, (paper_id,))
+        updated = mcur.rowcount
+
+        # Retire questions removed from the source
+        mcur.execute("""
+            UPDATE questions SET retired_at = ?
+            WHERE paper_id = ? AND retired_at IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM incoming i
+                  WHERE i.question_hash = questions.question_hash AND i.occurrence = questions.occurrence
+              )
+        """, (time.time(), paper_id))
+        retired = mcur.rowcount
+
+        # Insert new questions
+        mcur.execute(f"""
+            INSERT INTO questions (paper_id, {QUESTION_COLUMNS}, question_hash, occurrence)
+            SELECT ?, {QUESTION_COLUMNS}, i.question_hash, i.occurrence
+            FROM incoming i
+            WHERE NOT EXISTS (
+                SELECT 1 FROM questions q
+                WHERE q.paper_id = ? AND q.question_hash = i.question_hash AND q.occurrence = i.occurrence
+            )
+            ORDER BY i.src_id
+        """, (paper_id, paper_id))
+        added = mcur.rowcount
 
         # Update total_questions
-        mcur.execute("UPDATE papers SET total_questions = ? WHERE paper_id = ?", (len(rows), paper_id))
+        mcur.execute("""
+            UPDATE papers
+            SET total_questions = (SELECT COUNT(*) FROM questions WHERE paper_id = ? AND retired_at IS NULL)
+            WHERE paper_id = ?
+        """, (paper_id, paper_id))
+
+        mcur.execute("""
+            INSERT INTO source_files (file_name, checksum, paper_id, merged_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(file_name) DO UPDATE SET
+                checksum = excluded.checksum,
+                paper_id = excluded.paper_id,
+                merged_at = excluded.merged_at
+        """, (db_file, checksum, paper_id, datetime.now().isoformat(timespec="seconds")))
+
+        master_conn.commit()
+        print(f"   paper {paper_id}: {added} added, {updated} updated, {retired} retired")
+        return paper_id
+    except Exception:
+        master_conn.rollback()
+        raise
+    finally:
+        mcur.execute("DROP TABLE IF EXISTS temp.incoming")
+        mcur.execute("DETACH DATABASE src")
+
+
+# ==== MERGE ====
+def merge_all(db_folder=DB_FOLDER, master_db=MASTER_DB, force=False):
+    """Merge every changed .db in db_folder; returns the paper ids that were (re)merged"""
+    migrate(master_db, verbose=True)
+
+    master_conn = sqlite3.connect(master_db)
+    register_functions(master_conn)
+    # Transactions are managed explicitly so ATTACH/DETACH stay outside them
+    master_conn.isolation_level = None
+    mcur = master_conn.cursor()
+
+    known = dict(mcur.execute("SELECT file_name, checksum FROM source_files").fetchall())
+    merged = []
+
+    for db_file in sorted(os.listdir(db_folder)):
+        if not db_file.endswith(".db"):
+            continue
+        db_path = os.path.join(db_folder, db_file)
+        checksum = file_checksum(db_path)
+
+        if not force and known.get(db_file) == checksum:
+            print(f"⏭  {db_file} unchanged, skipping")
+            continue
+
+        print(f"📥 Importing from {db_file}")
+        merged.append(merge_source(master_conn, db_path, db_file, checksum))
+
+    if merged:
+        # Merge the search index segments written row by row by the sync triggers
+        master_conn.execute(search.OPTIMIZE)
+
+    # Fold the merge's WAL content into the main file so the WAL does not stay large
+    master_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    master_conn.close()
+    return merged
+
 
-        old_conn.close()
+# ==== MAIN ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally merge per-paper DBs into the master DB")
+    parser.add_argument("--db-folder", default=DB_FOLDER)
+    parser.add_argument("--master", default=MASTER_DB)
+    parser.add_argument("--force", action="store_true", help="Re-merge sources even if unchanged")
+    args = parser.parse_args()
 
-# Save master DB
-master_conn.commit()
-master_conn.close()
+    try:
+        merged = merge_all(args.db_folder, args.master, force=args.force)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    print(f"✅ Merged {len(merged)} changed DB(s) into {args.master}")
 
-print(f"✅ Merged all DBs into {MASTER_DB}")
+    # Publish: recompile the snapshots the app loads for the papers that changed
+    if merged:
+        paths = publish_papers(args.master, merged)
+        print(f"📦 Published {len(paths)} paper snapshot(s)")
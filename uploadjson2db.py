@@ -1,13 +1,35 @@
 import sqlite3
 import json
 import os
+import time
+import argparse
+
+from db import search
+from db.questions import question_hash, register_functions
 
 # ==== CONFIG ====
 DB_FILE = "nism_questions_final_final.db"  # SQLite DB file name
 JSON_FILE = "nism_questions_final_final.json"  # Input JSON file
+BATCH_SIZE = 5000  # Rows per executemany / transaction
+READ_CHUNK = 1 << 16  # Bytes read from the JSON file at a time
+PROGRESS_EVERY = 10000  # Print progress every N rows
+
+# Pragmas applied for the duration of a bulk load, restored afterwards
+LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -65536,  # 64 MiB
+}
 
 # ==== CREATE DB & TABLE ====
-def create_db():
+def create_db(dedupe=False):
+    """Create or upgrade the questions table.
+
+    A DB from before question_hash gets the column backfilled once, before its
+    unique index is built. Questions that normalize to the same hash block the
+    index: they are only removed (keeping the newest copy) when dedupe is set.
+    """
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
@@ -22,77 +44,282 @@ def create_db():
             correct_answer TEXT,
             correct_option CHAR(1),
             explanation TEXT,
-            topic TEXT
+            topic TEXT,
+            question_hash TEXT
         )
     """)
+
+    # Older DBs were created without question_hash: add and backfill it
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(questions)")]
+    if "question_hash" not in columns:
+        cursor.execute("ALTER TABLE questions ADD COLUMN question_hash TEXT")
+    has_index = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_questions_hash'").fetchone()
+    if not has_index:
+        register_functions(conn)
+        cursor.execute("UPDATE questions SET question_hash = qhash(question) WHERE question_hash IS NULL")
+        duplicates = cursor.execute(
+            "SELECT COUNT(*) - COUNT(DISTINCT question_hash) FROM questions").fetchone()[0]
+        if duplicates:
+            if not dedupe:
+                conn.rollback()
+                conn.close()
+                raise ValueError(f"{DB_FILE}: {duplicates} questions duplicate another one after "
+                                 f"normalizing case and whitespace; rerun with --dedupe to keep "
+                                 f"only the newest copy of each")
+            cursor.execute("""
+                DELETE FROM questions
+                WHERE id NOT IN (SELECT MAX(id) FROM questions GROUP BY question_hash)
+            """)
+            print(f"🧹 Removed {cursor.rowcount} duplicate questions from {DB_FILE} (kept the newest copy)")
+
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_hash
+            ON questions(question_hash)
+        """)
+
+    # Full-text index, kept in sync by triggers from here on (upserts of unchanged text skip it)
+    search.ensure_index(conn)
     conn.commit()
     conn.close()
 
 
+# ==== STREAMING READER ====
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+MAX_RECORD = 1 << 24  # Characters buffered for one record before it is reported as malformed
+WHITESPACE = "\ufeff \t\r\n"
+
+
+def iter_records(path, chunk_size=READ_CHUNK, max_record=MAX_RECORD):
+    """Yield question dicts one at a time: one JSON value per line for .jsonl / .ndjson,
+    otherwise a top-level JSON array (or a bare sequence of objects)"""
+    if path.lower().endswith(JSONL_SUFFIXES):
+        return _iter_jsonl(path)
+    return _iter_json(path, chunk_size, max_record)
+
+
+def _iter_jsonl(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: {e.msg} (column {e.colno})") from e
+            # A line may hold one question or an array of them
+            if isinstance(obj, list):
+                yield from obj
+            else:
+                yield obj
+
+
+def _iter_json(path, chunk_size, max_record):
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        eof = not buf
+        pos = 0
+        offset = 0  # Characters of the file dropped from the front of buf
+
+        def skip(chars):
+            nonlocal buf, pos, eof, offset
+            # Advance past `chars`, reading on; returns False at EOF
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf):
+                    return True
+                if eof:
+                    return False
+                offset += len(buf)
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+
+        if not skip(WHITESPACE):
+            return
+        in_array = buf[pos] == "["
+        if in_array:
+            pos += 1
+
+        while True:
+            # Skip separators between records
+            if not skip(WHITESPACE + ","):
+                if in_array:
+                    raise ValueError(f"Unexpected end of JSON array in {path}")
+                return
+
+            if in_array and buf[pos] == "]":
+                pos += 1
+                if skip(WHITESPACE):
+                    raise ValueError(f"{path}: unexpected content after the top-level array "
+                                     f"at character {offset + pos}")
+                return
+
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"{path}: {e.msg} at character {offset + e.pos}") from e
+                if len(buf) - pos > max_record:
+                    raise ValueError(f"{path}: record at character {offset + pos} is malformed "
+                                     f"or longer than {max_record} characters ({e.msg})") from e
+                # Record spans the chunk boundary: keep the tail and read more
+                more = f.read(chunk_size)
+                eof = not more
+                offset += pos
+                buf, pos = buf[pos:] + more, 0
+                continue
+
+            # A number/keyword cut at the chunk boundary decodes "successfully"
+            if end == len(buf) and not eof and not isinstance(obj, (dict, list)):
+                more = f.read(chunk_size)
+                eof = not more
+                offset += pos
+                buf, pos = buf[pos:] + more, 0
+                continue
+
+            pos = end
+            if isinstance(obj, list):
+                # Bare sequence holding a whole array of questions
+                yield from obj
+            else:
+                yield obj
+
+            # Drop consumed text so memory stays bounded by the chunk size
+            if pos > chunk_size:
+                offset += pos
+                buf, pos = buf[pos:], 0
+
+
+# ==== NORMALIZE ====
+def to_row(q):
+    question_text = (q.get("question_text") or "").strip()
+    options = q.get("options") or []
+
+    # Fill missing options with None
+    option_a = options[0] if len(options) > 0 else None
+    option_b = options[1] if len(options) > 1 else None
+    option_c = options[2] if len(options) > 2 else None
+    option_d = options[3] if len(options) > 3 else None
+
+    correct_answer = (q.get("correct_answer") or "").strip()
+
+    # Find correct option letter (A/B/C/D) if it matches one of the options
+    correct_option = None
+    for letter, opt in zip(['A', 'B', 'C', 'D'], [option_a, option_b, option_c, option_d]):
+        if opt and opt.strip().lower() == correct_answer.lower():
+            correct_option = letter
+            break
+
+    explanation = (q.get("explanation") or "").strip()
+    topic = (q.get("topic") or "").strip()
+
+    return (question_text, option_a, option_b, option_c, option_d,
+            correct_answer, correct_option, explanation, topic,
+            question_hash(question_text))
+
+
 # ==== INSERT OR UPDATE ====
-def insert_or_update(data):
+UPSERT_SQL = """
+    INSERT INTO questions
+    (question, option_a, option_b, option_c, option_d,
+     correct_answer, correct_option, explanation, topic, question_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(question_hash) DO UPDATE SET
+        question=excluded.question,
+        option_a=excluded.option_a, option_b=excluded.option_b,
+        option_c=excluded.option_c, option_d=excluded.option_d,
+        correct_answer=excluded.correct_answer,
+        correct_option=excluded.correct_option,
+        explanation=excluded.explanation, topic=excluded.topic
+"""
+
+
+def upsert_rows(cursor, rows):
+    cursor.executemany(UPSERT_SQL, rows)
+
+
+def apply_pragmas(conn, pragmas):
+    """Set pragmas and return their previous values so they can be restored"""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+
+def insert_or_update(data, batch_size=BATCH_SIZE, progress_every=PROGRESS_EVERY):
+    """Upsert an iterable of question dicts, committing every `batch_size` rows"""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
+    previous = apply_pragmas(conn, LOAD_PRAGMAS)
 
-    for idx, q in enumerate(data, start=1):
-        question_text = q.get("question_text", "").strip()
-        options = q.get("options", [])
-        
-        # Fill missing options with None
-        option_a = options[0] if len(options) > 0 else None
-        option_b = options[1] if len(options) > 1 else None
-        option_c = options[2] if len(options) > 2 else None
-        option_d = options[3] if len(options) > 3 else None
-
-        correct_answer = q.get("correct_answer", "").strip()
-        
-        # Find correct option letter (A/B/C/D) if it matches one of the options
-        correct_option = None
-        for letter, opt in zip(['A', 'B', 'C', 'D'], [option_a, option_b, option_c, option_d]):
-            if opt and opt.strip().lower() == correct_answer.strip().lower():
-                correct_option = letter
-                break
-
-        explanation = q.get("explanation", "").strip()
-        topic = q.get("topic", "").strip()
-
-        # UPSERT: update if question exists, else insert
-        cursor.execute("""
-            SELECT id FROM questions WHERE question = ?
-        """, (question_text,))
-        existing = cursor.fetchone()
+    total = 0
+    started = time.perf_counter()
+    next_report = progress_every
+    batch = []
 
-        if existing:
-            cursor.execute("""
-                UPDATE questions
-                SET option_a=?, option_b=?, option_c=?, option_d=?,
-                    correct_answer=?, correct_option=?, explanation=?, topic=?
-                WHERE id=?
-            """, (option_a, option_b, option_c, option_d,
-                  correct_answer, correct_option, explanation, topic, existing[0]))
-        else:
-            cursor.execute("""
-                INSERT INTO questions
-                (question, option_a, option_b, option_c, option_d,
-                 correct_answer, correct_option, explanation, topic)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (question_text, option_a, option_b, option_c, option_d,
-                  correct_answer, correct_option, explanation, topic))
+    def flush():
+        # One explicit transaction per batch
+        cursor.execute("BEGIN")
+        upsert_rows(cursor, batch)
+        conn.commit()
+        batch.clear()
 
-    conn.commit()
-    conn.close()
+    try:
+        for q in data:
+            batch.append(to_row(q))
+            if len(batch) >= batch_size:
+                total += len(batch)
+                flush()
+                if progress_every and total >= next_report:
+                    elapsed = time.perf_counter() - started
+                    print(f"  … {total} rows ({total / elapsed:,.0f} rows/s)")
+                    next_report += progress_every
+        if batch:
+            total += len(batch)
+            flush()
+        if total:
+            conn.execute(search.OPTIMIZE)
+            conn.commit()
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        apply_pragmas(conn, previous)
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"⏱  {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return total
 
 
 # ==== MAIN ====
 if __name__ == "__main__":
-    if not os.path.exists(JSON_FILE):
-        print(f"JSON file not found: {JSON_FILE}")
-        exit()
+    parser = argparse.ArgumentParser(description="Stream a JSON array / JSONL question file into SQLite")
+    parser.add_argument("json_file", nargs="?", default=JSON_FILE)
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--progress-every", type=int, default=PROGRESS_EVERY)
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Delete older copies of duplicate questions when upgrading a pre-hash DB")
+    args = parser.parse_args()
 
-    with open(JSON_FILE, "r", encoding="utf-8") as f:
-        questions_data = json.load(f)
+    DB_FILE = args.db
+
+    if not os.path.exists(args.json_file):
+        print(f"JSON file not found: {args.json_file}")
+        exit()
 
-    create_db()
-    insert_or_update(questions_data)
+    try:
+        create_db(dedupe=args.dedupe)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    count = insert_or_update(iter_records(args.json_file),
+                             batch_size=args.batch_size,
+                             progress_every=args.progress_every)
 
-    print(f"✅ Database '{DB_FILE}' updated successfully with {len(questions_data)} questions.")
+    print(f"✅ Database '{DB_FILE}' updated successfully with {count} questions.")
@@ -0,0 +1,31 @@
+# widgets/countdown.py
+import os
+import time
+import streamlit as st
+import streamlit.components.v1 as components
+
+_countdown = components.declare_component(
+    "exam_countdown",
+    path=os.path.join(os.path.dirname(__file__), "countdown_frontend"),
+)
+
+
+def countdown(deadline, key="exam_countdown"):
+    """Ticking mm:ss display driven by the browser; no server reruns while it counts.
+
+    `deadline` is a server epoch timestamp. The browser is sent the time left
+    on the server clock and counts it down on its own monotonic clock, so a
+    skewed client clock does not matter. Returns True once per report that
+    the countdown reached zero; the caller re-checks the deadline.
+    """
+    remaining_ms = max(0, int((deadline - time.time()) * 1000))
+    value = _countdown(remaining_ms=remaining_ms, key=key, default=None)
+    if not value:
+        return False
+
+    # The component keeps returning its last value on later reruns: act on each report once
+    last_key = f"{key}_last_report"
+    if st.session_state.get(last_key) == value["n"]:
+        return False
+    st.session_state[last_key] = value["n"]
+    return True
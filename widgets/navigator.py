@@ -0,0 +1,30 @@
+# widgets/navigator.py
+import os
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Per-question state codes in the compact state string sent to the browser
+PENDING, ANSWERED, MARKED = "0", "1", "2"
+
+_navigator = components.declare_component(
+    "exam_navigator",
+    path=os.path.join(os.path.dirname(__file__), "navigator_frontend"),
+)
+
+
+def exam_navigator(states, cols=5, key="exam_navigator"):
+    """Question grid rendered client-side from `states` (one code per question).
+
+    Returns the index of a newly clicked question, else None. Filtering to
+    marked questions happens in the browser without a rerun.
+    """
+    value = _navigator(states=states, cols=cols, key=key, default=None)
+    if not value:
+        return None
+
+    # The component keeps returning its last value on later reruns: act on each click once
+    last_key = f"{key}_last_click"
+    if st.session_state.get(last_key) == value["n"]:
+        return None
+    st.session_state[last_key] = value["n"]
+    return value["q"]